@@ -0,0 +1,11 @@
+from django.contrib.auth.backends import ModelBackend
+
+from account import repository
+
+
+class CachedModelBackend(ModelBackend):
+    """Reads the session user from the shared cache instead of the database"""
+
+    def get_user(self, user_id):
+        user = repository.get_cached_account(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0008_remove_account_profile_picture'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-date_joined'], name='account_active_joined_idx'),
+        ),
+    ]
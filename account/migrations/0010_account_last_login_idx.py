@@ -0,0 +1,17 @@
+# Generated by Django 4.0.2 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0009_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['last_login'], name='account_last_login_idx'),
+        ),
+    ]
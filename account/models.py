@@ -46,6 +46,13 @@ class Account(AbstractBaseUser):
 
     objects = MyAccountManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date_joined'], condition=models.Q(is_active=True),
+                         name='account_active_joined_idx'),
+            models.Index(fields=['last_login'], name='account_last_login_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -0,0 +1,129 @@
+"""
+In-memory prefix index of active accounts by username and email.
+
+Other workers' changes are picked up through the Account version and last_login (auto_now). Deletions
+are only seen on a full rebuild, so search() checks the hits against the database.
+"""
+import bisect
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from account.models import Account
+from core import versions
+
+# Allowance for clock skew between application servers
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+
+
+class AccountPrefixIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.accounts = dict()
+        self.usernames = []
+        self.emails = []
+        self.version = None
+        self.synced_at = None
+        self.rebuilt_at = None
+
+    def _insert(self, pk, username, email):
+        self.accounts[pk] = (username, email)
+        bisect.insort(self.usernames, (username.lower(), pk))
+        bisect.insort(self.emails, (email.lower(), pk))
+
+    def _delete(self, pk):
+        username, email = self.accounts.pop(pk)
+        for keys, key in ((self.usernames, (username.lower(), pk)), (self.emails, (email.lower(), pk))):
+            position = bisect.bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                del keys[position]
+
+    def update(self, pk, username, email, is_active):
+        with self.lock:
+            if pk in self.accounts:
+                self._delete(pk)
+            if is_active:
+                self._insert(pk, username, email)
+
+    def remove(self, pk):
+        with self.lock:
+            if pk in self.accounts:
+                self._delete(pk)
+
+    @property
+    def is_built(self):
+        return self.rebuilt_at is not None
+
+    def rebuild(self):
+        rows = list(Account.objects.filter(is_active=True).values_list('pk', 'username', 'email'))
+
+        with self.lock:
+            self.accounts = {pk: (username, email) for pk, username, email in rows}
+            self.usernames = sorted((username.lower(), pk) for pk, username, _ in rows)
+            self.emails = sorted((email.lower(), pk) for pk, _, email in rows)
+            self.rebuilt_at = time.monotonic()
+
+    def needs_rebuild(self):
+        return not self.is_built or time.monotonic() - self.rebuilt_at > settings.ACCOUNT_INDEX_REBUILD_INTERVAL
+
+    def sync(self):
+        # The rebuild interval is checked even without a version change: bulk_create and import_blog don't bump it
+        version, _ = versions.get_model_versions([Account])[Account]
+        if version == self.version and not self.needs_rebuild():
+            return
+
+        with self.sync_lock:
+            if version == self.version and not self.needs_rebuild():
+                return
+
+            started = timezone.now()
+            if self.needs_rebuild():
+                # Also drops accounts deleted by other workers
+                self.rebuild()
+            else:
+                changed = (Account.objects.filter(last_login__gte=self.synced_at - SYNC_OVERLAP)
+                           .values_list('pk', 'username', 'email', 'is_active'))
+                for row in changed:
+                    self.update(*row)
+
+            self.version, self.synced_at = version, started
+
+    def _match(self, keys, prefix, limit):
+        position = bisect.bisect_left(keys, (prefix,))
+        matched = []
+
+        while position < len(keys) and len(matched) < limit and keys[position][0].startswith(prefix):
+            matched.append(keys[position][1])
+            position += 1
+
+        return matched
+
+    def search(self, prefix, limit, emails=False):
+        """Up to limit (id, username, email) matching prefix case-insensitively, usernames first"""
+        self.sync()
+        prefix = prefix.lower()
+
+        with self.lock:
+            found = self._match(self.usernames, prefix, limit)
+            if emails and len(found) < limit:
+                seen = set(found)
+                found += [pk for pk in self._match(self.emails, prefix, limit) if pk not in seen][:limit - len(found)]
+
+        if not found:
+            return []
+
+        active = {pk: (username, email) for pk, username, email
+                  in Account.objects.filter(pk__in=found, is_active=True).values_list('pk', 'username', 'email')}
+        for pk in found:
+            if pk not in active:
+                self.remove(pk)
+
+        return [(pk, *active[pk]) for pk in found if pk in active]
+
+
+index = AccountPrefixIndex()
@@ -1,10 +1,40 @@
 from account.models import Account
+from core import versions
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from typing import Optional
 
+ACCOUNT_CACHE_KEY = 'account:{}'
+
 
 def get_account_by_username(username: str) -> Optional[Account]:
     try:
         return Account.objects.get(username=username)
     except ObjectDoesNotExist:
         return None
+
+
+def get_cached_account(pk: int) -> Optional[Account]:
+    # Only a shared cache is used: with a per-process one, invalidation would not reach other workers
+    shared = versions.is_cache_shared()
+    key = ACCOUNT_CACHE_KEY.format(pk)
+    account = cache.get(key) if shared else None
+
+    if account is None:
+        try:
+            account = Account.objects.get(pk=pk)
+        except ObjectDoesNotExist:
+            return None
+        if shared:
+            cache.set(key, account, timeout=settings.ACCOUNT_CACHE_TIMEOUT)
+
+    return account
+
+
+def invalidate_cached_account(pk: int) -> None:
+    key = ACCOUNT_CACHE_KEY.format(pk)
+    cache.delete(key)
+    # Again after the commit: a concurrent request may have cached the old row meanwhile
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from account import repository
+from account.models import Account
+from account.prefix_index import index
+
+
+@receiver([post_save, post_delete], sender=Account)
+def invalidate_cached_account(sender, instance, **kwargs):
+    repository.invalidate_cached_account(instance.pk)
+
+
+@receiver(post_save, sender=Account)
+def update_prefix_index(sender, instance, **kwargs):
+    if index.is_built:
+        row = (instance.pk, instance.username, instance.email, instance.is_active)
+        transaction.on_commit(lambda: index.update(*row))
+
+
+@receiver(post_delete, sender=Account)
+def remove_from_prefix_index(sender, instance, **kwargs):
+    if index.is_built:
+        pk = instance.pk
+        transaction.on_commit(lambda: index.remove(pk))
@@ -1,3 +1,147 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from account.models import Account
+from account.prefix_index import index
+from core.tests import SHARED_CACHE
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AccountTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+        self.staff = Account.objects.create_user('staff@example.com', 'staff', 'password')
+        self.staff.is_staff = True
+        self.staff.save()
+        self.user = Account.objects.create_user('user@example.com', 'user', 'password')
+        for username in ('alice', 'Alfred', 'albert'):
+            Account.objects.create_user(f'{username.lower()}@example.com', username, 'password')
+        # The process-wide index is rebuilt from this test's database on the first search
+        index.version = index.rebuilt_at = None
+
+        self.client = APIClient()
+        self.user_client = APIClient()
+        self.user_client.login(email='user@example.com', password='password')
+        self.staff_client = APIClient()
+        self.staff_client.login(email='staff@example.com', password='password')
+
+
+class SessionAccountTests(AccountTestCase):
+
+    def test_session_account(self):
+        response = self.user_client.get('/api/accounts/me')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['username'], 'user')
+
+    @override_settings(CACHES=SHARED_CACHE, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_shared_cache_serves_warm_sessions(self):
+        cache.clear()
+        self.user_client.get('/api/accounts/me')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.user_client.get('/api/accounts/me').status_code, 200)
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_deactivation_logs_out(self):
+        cache.clear()
+        self.user_client.get('/api/accounts/me')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertEqual(self.user_client.get('/api/accounts/me').status_code, 403)
+
+    def test_deactivation_without_signals_logs_out(self):
+        # Without a shared cache the session account is read from the database, like a change made by another worker
+        self.user_client.get('/api/accounts/me')
+        Account.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        self.assertEqual(self.user_client.get('/api/accounts/me').status_code, 403)
+
+    def test_update_is_saved_over_the_current_row(self):
+        self.user_client.get('/api/accounts/me')
+        Account.objects.filter(pk=self.user.pk).update(is_staff=True)
+
+        response = self.user_client.patch('/api/accounts/me', {'username': 'changed'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.username, self.user.is_staff), ('changed', True))
+
+    def test_only_owner_changes_account(self):
+        response = self.user_client.patch(f'/api/accounts/{self.staff.pk}', {'username': 'changed'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        response = self.user_client.patch(f'/api/accounts/{self.user.pk}', {'username': 'changed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout(self):
+        self.assertEqual(self.user_client.get('/api/accounts/logout').status_code, 204)
+        self.assertEqual(self.user_client.get('/api/accounts/me').status_code, 403)
+
+
+class AccountListTests(AccountTestCase):
+
+    def test_username_filter(self):
+        response = self.client.get('/api/accounts', {'username': 'alice'})
+
+        self.assertEqual([account['username'] for account in response.json()], ['alice'])
+
+
+class AccountSearchTests(AccountTestCase):
+
+    def search(self, client, prefix, **params):
+        response = client.get('/api/accounts/search', {'prefix': prefix, **params})
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def test_prefix_ignores_case_and_is_sorted(self):
+        found = self.search(self.client, 'AL')
+
+        self.assertEqual([account['username'] for account in found], ['albert', 'Alfred', 'alice'])
+        self.assertNotIn('email', found[0])
+
+    def test_limit(self):
+        self.assertEqual(len(self.search(self.client, 'al', limit=2)), 2)
+
+    def test_staff_search_emails(self):
+        found = self.search(self.staff_client, 'user@')
+
+        self.assertEqual(found, [{'id': self.user.pk, 'username': 'user', 'email': 'user@example.com'}])
+        self.assertEqual(self.search(self.client, 'user@'), [])
+
+    def test_saved_changes_are_found(self):
+        self.search(self.client, 'al')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Account.objects.create_user('alina@example.com', 'alina', 'password')
+            alfred = Account.objects.get(username='Alfred')
+            alfred.is_active = False
+            alfred.save()
+
+        self.assertEqual([account['username'] for account in self.search(self.client, 'al')],
+                         ['albert', 'alice', 'alina'])
+
+    def test_deactivated_and_deleted_elsewhere_are_hidden(self):
+        self.search(self.client, 'al')
+        # Neither change reaches this process's index here, as if another worker made it
+        Account.objects.filter(username='alice').update(is_active=False)
+        Account.objects.filter(username='albert').delete()
+
+        self.assertEqual([account['username'] for account in self.search(self.staff_client, 'al')], ['Alfred'])
+        self.assertEqual(self.search(self.staff_client, 'alice@'), [])
+
+    def test_unversioned_inserts_are_found_after_rebuild_interval(self):
+        self.search(self.client, 'al')
+        # bulk_create sends no signals and does not change the Account version
+        Account.objects.bulk_create([Account(email='alina@example.com', username='alina')])
+        self.assertNotIn('alina', [account['username'] for account in self.search(self.client, 'al')])
+
+        with override_settings(ACCOUNT_INDEX_REBUILD_INTERVAL=0):
+            self.assertIn('alina', [account['username'] for account in self.search(self.client, 'al')])
@@ -0,0 +1,16 @@
+from django.urls import URLPattern
+
+from core.api import urls
+from core.api.async_views import async_read_view
+
+
+def _async_pattern(pattern):
+    view = async_read_view(pattern.callback)
+    if view is None:
+        return pattern
+
+    return URLPattern(pattern.pattern, view, pattern.default_args, pattern.name)
+
+
+# core.api.urls with async GET list/retrieve views
+urlpatterns = [_async_pattern(pattern) for pattern in urls.urlpatterns]
@@ -0,0 +1,152 @@
+"""
+Async list and retrieve views for ASGI (core.async_urls).
+
+Django 4.0 has no async ORM, so queries go through sync_to_async. Permissions, filters and serialization
+come from the same DRF viewsets, so responses match the sync views.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.utils.cache import get_conditional_response
+from rest_flex_fields import EXPAND_PARAM
+from rest_framework.response import Response
+
+import core.serializers.post
+from core.api import views
+from core.api.utils import ConditionalGetMixin, ResponseCacheMixin
+
+ASYNC_READ_VIEWSETS = (views.PostViewSet, views.PostCategoryViewSet, views.CommentViewSet, views.ReactionsViewSet)
+
+# Requests with these parameters go to the sync viewset
+SYNC_ONLY_PARAMS = (EXPAND_PARAM, 'cursor', 'export')
+
+
+def _is_async_readable(request):
+    return (request.method == 'GET'
+            and 'HTTP_AUTHORIZATION' not in request.META
+            and not any(param in request.GET for param in SYNC_ONLY_PARAMS))
+
+
+class AsyncRead:
+    """Runs list or retrieve of a DRF viewset, batching database and cache calls into few thread hops"""
+
+    def __init__(self, callback, request, args, kwargs):
+        self.viewset = callback.cls(**callback.initkwargs)
+        self.viewset.action_map = callback.actions
+        self.viewset.args = args
+        self.viewset.kwargs = kwargs
+        self.request = request
+
+    async def dispatch(self):
+        viewset = self.viewset
+        # Load the session user up front so DRF doesn't hit the database from the event loop
+        if settings.SESSION_COOKIE_NAME in self.request.COOKIES:
+            self.request.user = await sync_to_async(auth.get_user)(self.request)
+        else:
+            self.request.user = AnonymousUser()
+
+        request = viewset.initialize_request(self.request, *viewset.args, **viewset.kwargs)
+        viewset.request = request
+        viewset.headers = viewset.default_response_headers
+
+        try:
+            viewset.initial(request, *viewset.args, **viewset.kwargs)
+            response = await self.respond()
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+
+        return viewset.finalize_response(request, response, *viewset.args, **viewset.kwargs)
+
+    def lookup(self):
+        etag = last_modified = key = cached = None
+
+        if isinstance(self.viewset, ConditionalGetMixin):
+            etag, last_modified = self.viewset.get_conditional_validators()
+        if isinstance(self.viewset, ResponseCacheMixin):
+            key = self.viewset.get_response_cache_key()
+            cached = cache.get(key) if key is not None else None
+
+        return etag, last_modified, key, cached
+
+    async def respond(self):
+        viewset = self.viewset
+        response = None
+        etag, last_modified, key, data = await sync_to_async(self.lookup)()
+
+        if etag is not None:
+            response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+
+        if response is None:
+            if data is None:
+                data = await (self.list_data() if viewset.action == 'list' else self.retrieve_data())
+                if key is not None:
+                    await sync_to_async(cache.set)(key, data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+            response = Response(data)
+
+        if etag is not None:
+            viewset.set_conditional_headers(response, etag, last_modified)
+
+        return response
+
+    def get_many_to_many(self, queryset):
+        return [field.name for field in queryset.model._meta.many_to_many]
+
+    def fetch_list(self):
+        viewset = self.viewset
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        serializer = viewset.get_serializer(queryset, many=True)
+
+        if isinstance(serializer, core.serializers.post.PostListValuesSerializer):
+            plan = serializer.get_plan()
+            rows = list(serializer.get_rows_queryset(plan))
+            links = list(serializer.get_links_queryset(plan, [row['id'] for row in rows]))
+
+            return serializer, (plan, rows, links)
+
+        return None, list(queryset.prefetch_related(*self.get_many_to_many(queryset)))
+
+    async def list_data(self):
+        # Filters may query the database (e.g. the author exists), so they run with the fetch
+        values_serializer, rows = await sync_to_async(self.fetch_list)()
+
+        if values_serializer is not None:
+            return values_serializer.render(*rows)
+
+        return self.viewset.get_serializer(rows, many=True).data
+
+    def fetch_object(self):
+        # Object permissions may touch related models
+        instance = self.viewset.get_object()
+        prefetch_related_objects([instance], *self.get_many_to_many(self.viewset.get_queryset()))
+
+        return instance
+
+    async def retrieve_data(self):
+        instance = await sync_to_async(self.fetch_object)()
+
+        return self.viewset.get_serializer(instance).data
+
+
+def async_read_view(callback):
+    """Async view for a DRF viewset route with GET list/retrieve, or None; other requests fall back to callback"""
+    actions = getattr(callback, 'actions', None) or {}
+    if getattr(callback, 'cls', None) not in ASYNC_READ_VIEWSETS or actions.get('get') not in ('list', 'retrieve'):
+        return None
+
+    sync_view = sync_to_async(callback)
+
+    async def view(request, *args, **kwargs):
+        if not _is_async_readable(request):
+            return await sync_view(request, *args, **kwargs)
+
+        return await AsyncRead(callback, request, args, kwargs).dispatch()
+
+    view.csrf_exempt = True
+    view.cls = callback.cls
+    view.initkwargs = callback.initkwargs
+    view.actions = actions
+
+    return view
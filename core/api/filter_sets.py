@@ -1,4 +1,6 @@
+import core.category_index
 import core.models
+import core.search
 from django_filters import rest_framework as filters
 
 
@@ -6,9 +8,33 @@ class CategoryInFilter(filters.BaseInFilter, filters.CharFilter):
     pass
 
 
+CATEGORY_FILTERS = {'categories__in': 'any_of', 'categories__all': 'all_of', 'categories__not': 'none_of'}
+
+
 class PostFilter(filters.FilterSet):
-    categories__in = CategoryInFilter(field_name='categories__name', lookup_expr='in')
+    categories__in = CategoryInFilter(method='filter_categories')
+    categories__all = CategoryInFilter(method='filter_categories')
+    categories__not = CategoryInFilter(method='filter_categories')
+    q = filters.CharFilter(method='filter_search')
+
+    def filter_search(self, queryset, name, value):
+        return core.search.search_posts(queryset, value)
+
+    def filter_categories(self, queryset, name, value):
+        # Category filters are applied together in filter_queryset
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        categories = {argument: self.form.cleaned_data.get(name) or ()
+                      for name, argument in CATEGORY_FILTERS.items()}
+
+        if any(categories.values()):
+            queryset = core.category_index.filter_posts(queryset, **categories)
+
+        return queryset
 
     class Meta:
         model = core.models.Post
-        fields = ('title', 'is_active', 'author__username', 'author', 'date', 'categories__in')
\ No newline at end of file
+        fields = ('title', 'is_active', 'author__username', 'author', 'date', 'categories__in', 'categories__all',
+                  'categories__not', 'q')
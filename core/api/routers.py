@@ -29,6 +29,13 @@ class AccountRouter(SimpleRouter):
             detail=True,
             initkwargs={'suffix': 'Detail'}
         ),
+        Route(
+            url=r'^{prefix}/search{trailing_slash}$',
+            mapping={'get': 'search'},
+            name='{basename}-search',
+            detail=False,
+            initkwargs={'suffix': 'Search'}
+        ),
 
         Route(
             url=r'^{prefix}/{lookup}{trailing_slash}$',
@@ -54,6 +61,13 @@ class PostRouter(SimpleRouter):
             detail=False,
             initkwargs={'suffix': 'List'}
         ),
+        Route(
+            url=r'^{prefix}/feed{trailing_slash}$',
+            mapping={'get': 'feed'},
+            name='{basename}-feed',
+            detail=False,
+            initkwargs={'suffix': 'Feed'}
+        ),
         Route(
             url=r'^{prefix}/{lookup}{trailing_slash}$',
             mapping={'get': 'retrieve', 'patch': 'partial_update'},
@@ -64,6 +78,23 @@ class PostRouter(SimpleRouter):
     ]
 
 
+class PostCommentsRouter(SimpleRouter):
+
+    def __init__(self):
+        super().__init__()
+        self.trailing_slash = '/?'
+
+    routes = [
+        Route(
+            url=r'^{prefix}/{lookup}/comments{trailing_slash}$',
+            mapping={'get': 'comments'},
+            name='{basename}',
+            detail=True,
+            initkwargs={'suffix': 'Comments'}
+        ),
+    ]
+
+
 class CommentariesReactionsRouter(SimpleRouter):
 
     def __init__(self):
@@ -1,11 +1,17 @@
 
+from django.urls import re_path
+
 from core.api import views
-from core.api.routers import SimpleRouterOptionalSlash, PostRouter, AccountRouter, CommentariesReactionsRouter
+from core.api.routers import (SimpleRouterOptionalSlash, PostRouter, PostCommentsRouter, AccountRouter,
+                              CommentariesReactionsRouter)
 
 posts_router = PostRouter()
 
 posts_router.register('posts', views.PostViewSet)
 
+post_comments_router = PostCommentsRouter()
+post_comments_router.register('posts', views.PostCommentsViewSet, basename='post-comments')
+
 commentaries_reactions_router = CommentariesReactionsRouter()
 
 commentaries_reactions_router.register('reactions', views.ReactionsViewSet)
@@ -18,9 +24,11 @@ router = SimpleRouterOptionalSlash()
 router.register('categories', views.PostCategoryViewSet)
 
 urlpatterns = [
+    re_path(r'^metrics/?$', views.MetricsView.as_view(), name='metrics'),
 ]
 
 urlpatterns += router.urls
 urlpatterns += posts_router.urls
+urlpatterns += post_comments_router.urls
 urlpatterns += account_router.urls
 urlpatterns += commentaries_reactions_router.urls
\ No newline at end of file
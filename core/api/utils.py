@@ -1,6 +1,27 @@
+import base64
+import binascii
+import hashlib
+import json
+import math
+import time
+
 import django_filters
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+from rest_flex_fields import EXPAND_PARAM, WILDCARD_VALUES
+from rest_flex_fields.utils import split_levels
+from rest_framework.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.response import Response
 
-from core.serializers.utils import LimitOffsetSerializer
+from core import db_router, export, permissions, versions
+from core.serializers.utils import LimitOffsetSerializer, CursorSerializer
 
 
 def limit_filter(request, queryset):
@@ -24,5 +45,422 @@ def limit_filter(request, queryset):
 
     return queryset[start:end]
 
+
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None, False
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return list(payload['v']), bool(payload['r'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValidationError({'cursor': ['Invalid cursor']})
+
+
+def _keyset_condition(ordering, values, reverse):
+    """Filter for rows strictly after the cursor position in ordering"""
+    condition = Q()
+
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != reverse
+        step = Q(**{f'{name}__{"lt" if descending else "gt"}': values[index]})
+
+        for previous_field, previous_value in zip(ordering[:index], values[:index]):
+            step &= Q(**{previous_field.lstrip('-'): previous_value})
+
+        condition |= step
+
+    return condition
+
+
+def _reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class CursorPaginationMixin:
+    """Keyset pagination with ?cursor=, so deep pages cost as much as the first one"""
+    cursor_ordering = ('-id',)
+    cursor_default_limit = 20
+    cursor_actions = ('list',)
+
+    def is_cursor_request(self):
+        return self.action in self.cursor_actions and 'cursor' in self.request.GET
+
+    def cursor_filter(self, queryset):
+        cursor_serializer = CursorSerializer(data=self.request.GET)
+        cursor_serializer.is_valid(raise_exception=True)
+
+        self.cursor_limit = cursor_serializer.validated_data.get('limit', self.cursor_default_limit)
+        values, self.cursor_reverse = decode_cursor(cursor_serializer.validated_data.get('cursor'))
+        self.cursor_is_first_page = values is None
+
+        ordering = self.cursor_ordering
+        if self.cursor_reverse:
+            ordering = _reverse_ordering(ordering)
+
+        if values is not None:
+            if len(values) != len(ordering):
+                raise ValidationError({'cursor': ['Invalid cursor']})
+
+            model_meta = queryset.model._meta
+            values = [model_meta.get_field(field.lstrip('-')).to_python(value)
+                      for field, value in zip(ordering, values)]
+            queryset = queryset.filter(_keyset_condition(ordering, values, False))
+
+        return queryset.order_by(*ordering)[:self.cursor_limit + 1]
+
+    def _cursor_values(self, instance):
+        values = []
+
+        for field in self.cursor_ordering:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+
+        return values
+
+    def paginate_cursor(self, rows):
+        rows = list(rows)
+        has_more = len(rows) > self.cursor_limit
+        rows = rows[:self.cursor_limit]
+
+        if self.cursor_reverse:
+            rows.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, not self.cursor_is_first_page
+
+        next_cursor = encode_cursor(self._cursor_values(rows[-1])) if rows and has_next else None
+        prev_cursor = encode_cursor(self._cursor_values(rows[0]), reverse=True) if rows and has_prev else None
+
+        return rows, next_cursor, prev_cursor
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_cursor_request():
+            return super().list(request, *args, **kwargs)
+
+        return self.cursor_response(self.filter_queryset(self.get_queryset()))
+
+    def cursor_response(self, queryset):
+        rows, next_cursor, prev_cursor = self.paginate_cursor(queryset)
+        serializer = self.get_serializer(rows, many=True)
+
+        return Response({'next': next_cursor, 'prev': prev_cursor, 'results': serializer.data})
+
+
+def _expandable_serializer_class(expandable):
+    if isinstance(expandable, tuple):
+        expandable = expandable[0]
+    if isinstance(expandable, str):
+        expandable = import_string(expandable)
+
+    return expandable
+
+
+def get_related_lookups(serializer_class, expand, prefix='', in_prefetch=False):
+    """select_related and prefetch_related paths for the fields requested with ?expand=, nested ones included"""
+    meta = serializer_class.Meta
+    model = meta.model
+    declared_fields = getattr(meta, 'fields', '__all__')
+    expandable_fields = getattr(meta, 'expandable_fields', {})
+    select_related, prefetch_related = [], []
+
+    for field in model._meta.many_to_many:
+        if declared_fields == '__all__' or field.name in declared_fields:
+            prefetch_related.append(prefix + field.name)
+
+    expand_fields, nested_expand = split_levels(expand)
+    if WILDCARD_VALUES and set(expand_fields) & set(WILDCARD_VALUES):
+        expand_fields = list(expandable_fields)
+
+    for name in expand_fields:
+        if name not in expandable_fields:
+            continue
+
+        field = model._meta.get_field(name)
+        path = prefix + name
+        is_prefetched = in_prefetch or field.many_to_many or field.one_to_many
+
+        if is_prefetched:
+            prefetch_related.append(path)
+        else:
+            select_related.append(path)
+
+        nested_select, nested_prefetch = get_related_lookups(
+            _expandable_serializer_class(expandable_fields[name]),
+            nested_expand.get(name, []),
+            prefix=f'{path}__',
+            in_prefetch=is_prefetched,
+        )
+        select_related += nested_select
+        prefetch_related += nested_prefetch
+
+    return sorted(set(select_related)), sorted(set(prefetch_related))
+
+
+class ExpandRelatedMixin:
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select_related, prefetch_related = get_related_lookups(self.get_serializer_class(),
+                                                               self.request.query_params.get(EXPAND_PARAM))
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        return queryset
+
+
+class ObjectPermissionListMixin:
+    """Applies object permissions to list querysets before paging"""
+    object_permission_actions = ('list',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.object_permission_actions:
+            queryset = permissions.filter_permitted(self.request, self, queryset)
+
+        return queryset
+
+
+class BulkCreateMixin:
+    """
+    POST of a JSON list creates each valid item with one bulk_create. Items are validated with
+    bulk_serializer_class, and check_bulk_items runs the database checks for the whole list at once.
+    """
+    bulk_serializer_class = None
+    bulk_max_items = 1000
+
+    def get_throttle_cost(self, request):
+        if self.action == 'create' and isinstance(request.data, list):
+            return max(len(request.data), 1)
+
+        return 1
+
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_create(request.data)
+
+        return super().create(request, *args, **kwargs)
+
+    def check_bulk_items(self, items):
+        """Errors or None for each item"""
+        return [None] * len(items)
+
+    def perform_bulk_create(self, items):
+        model = self.bulk_serializer_class.Meta.model
+        objs = model.objects.bulk_create([model(**item) for item in items])
+        versions.bump_model_version(model)
+
+        return objs
+
+    def bulk_create(self, items):
+        if not items:
+            raise ValidationError(['Expected a non-empty list'])
+        if len(items) > self.bulk_max_items:
+            raise ValidationError([f'No more than {self.bulk_max_items} items allowed'])
+
+        context = self.get_serializer_context()
+        results = dict()
+        valid = []
+
+        for index, item in enumerate(items):
+            item_serializer = self.bulk_serializer_class(data=item, context=context)
+            if item_serializer.is_valid():
+                valid.append((index, item_serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': status.HTTP_400_BAD_REQUEST,
+                                  'errors': item_serializer.errors}
+
+        checked = zip(valid, self.check_bulk_items([data for _, data in valid]))
+        to_create = []
+
+        for (index, data), errors in checked:
+            if errors:
+                results[index] = {'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
+            else:
+                to_create.append((index, data))
+
+        if to_create:
+            with transaction.atomic():
+                created = self.perform_bulk_create([data for _, data in to_create])
+
+            created_data = self.get_serializer(created, many=True).data
+            for (index, _), data in zip(to_create, created_data):
+                results[index] = {'index': index, 'status': status.HTTP_201_CREATED, 'data': data}
+
+        if not to_create:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(to_create) == len(items):
+            response_status = status.HTTP_201_CREATED
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+
+        return Response({'created': len(to_create),
+                         'failed': len(items) - len(to_create),
+                         'results': [results[index] for index in sorted(results)]},
+                        status=response_status)
+
+
+def get_user_class(user):
+    if user.is_anonymous:
+        return 'anonymous'
+
+    return 'staff' if user.is_staff else 'regular'
+
+
+def _related_model(model, path):
+    for name in path.split('__'):
+        model = model._meta.get_field(name).related_model
+
+    return model
+
+
+class ModelVersionsMixin:
+    """Versions of the serializer model, expanded models and version_models"""
+    version_models = ()
+
+    def get_version_models(self):
+        serializer_class = self.get_serializer_class()
+        model = serializer_class.Meta.model
+        select_related, prefetch_related = get_related_lookups(serializer_class,
+                                                               self.request.query_params.get(EXPAND_PARAM))
+        related_models = {_related_model(model, path) for path in select_related + prefetch_related}
+
+        return {model} | related_models | set(self.version_models)
+
+    def get_model_versions(self):
+        if not hasattr(self, '_model_versions'):
+            self._model_versions = versions.get_model_versions(self.get_version_models())
+
+            # A replica may lag behind a recent change that the versions already reflect
+            changed_at = max(modified for _, modified in self._model_versions.values())
+            if time.time() - changed_at < settings.REPLICA_STICKY_SECONDS:
+                db_router.pin_primary()
+
+        return self._model_versions
+
+    def get_versions_digest(self):
+        query = sorted((name, sorted(values)) for name, values in self.request.query_params.lists())
+        key = json.dumps([self.request.path, query, get_user_class(self.request.user),
+                          sorted((model._meta.label_lower, token)
+                                 for model, (token, _) in self.get_model_versions().items())])
+
+        return hashlib.sha1(key.encode()).hexdigest()
+
+
+class ConditionalGetMixin(ModelVersionsMixin):
+    """Weak ETag and Last-Modified for list and retrieve from model versions, only with a shared cache"""
+
+    def get_conditional_validators(self):
+        if not versions.is_cache_shared():
+            return None, None
+
+        etag = f'W/"{self.get_versions_digest()}"'
+        last_modified = math.ceil(max(modified for _, modified in self.get_model_versions().values()))
+        # Until this second is over another write may land in it unnoticed by If-Modified-Since
+        if last_modified > time.time():
+            last_modified = None
+
+        return etag, last_modified
+
+    def set_conditional_headers(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+
+        return response
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_conditional_validators()
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        return self.set_conditional_headers(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+
+class ResponseCacheMixin(ModelVersionsMixin):
+    """Caches list and retrieve data keyed on model versions, only with a shared cache"""
+
+    def get_response_cache_key(self):
+        if not versions.is_cache_shared():
+            return None
+
+        return f'response:{self.get_versions_digest()}'
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        key = self.get_response_cache_key()
+        if key is None:
+            return handler(request, *args, **kwargs)
+
+        cached = cache.get(key)
+
+        if cached is not None:
+            return Response(cached)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+
+class NDJSONExportMixin:
+    """Streams all filtered rows as NDJSON for staff with ?export=ndjson"""
+
+    def is_export_request(self):
+        return self.action == 'list' and self.request.query_params.get('export') == 'ndjson'
+
+    def export_response(self, request):
+        if request.user.is_anonymous or not request.user.is_staff:
+            self.permission_denied(request)
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by('pk')
+        stream = export.iter_ndjson(queryset)
+        model_name = queryset.model._meta.model_name
+
+        use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if use_gzip:
+            stream = export.gzip_stream(stream)
+
+        response = StreamingHttpResponse(stream, content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{model_name}.ndjson"'
+        response['Vary'] = 'Accept-Encoding'
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if self.is_export_request():
+            return self.export_response(request)
+
+        return super().list(request, *args, **kwargs)
+
+
 class CharFilterInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
     pass
@@ -1,34 +1,53 @@
 import core.serializers.account
 import core.serializers.category
 import core.serializers.comment
+import core.serializers.feed
 import core.serializers.post
 import core.serializers.reaction
 import core.serializers.utils
 import core.permissions
+import core.metrics
 import core.models
+import core.repository
+import core.versions
 
+from django.conf import settings
 from django.contrib.auth import get_user_model, authenticate, login, logout
+from django.db import transaction
+from django.http import Http404, HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 
+from django.db.models import QuerySet
+from rest_flex_fields import EXPAND_PARAM
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.views import APIView
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
+import account.prefix_index
 from account.models import Account
 
-from core.api.utils import limit_filter
+from core.api.utils import (limit_filter, CursorPaginationMixin, ExpandRelatedMixin, BulkCreateMixin,
+                            ConditionalGetMixin, ResponseCacheMixin, NDJSONExportMixin, ObjectPermissionListMixin)
 from core.api import filter_sets
 
 UserModel = get_user_model()
 
 
+def _missing_post_error(post_id):
+    return {'post': [f'Invalid pk "{post_id}" - object does not exist.']}
+
+
 class AccountViewSet(ModelViewSet):
     lookup_field = 'id'
     serializer_class = core.serializers.account.ReadAccountSerializer
     queryset = Account.objects.order_by('-date_joined')
-    filter_backend = [DjangoFilterBackend]
-    filter_fields = ('username', 'email', 'is_active', 'is_admin', 'is_staff')
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ('username', 'email', 'is_active', 'is_admin', 'is_staff')
     permission_classes = [core.permissions.AccountPermission]
+    throttle_scope = 'accounts'
+    throttle_ip_actions = ('create', 'user_login')
 
     def is_self_lookup(self):
         return self.kwargs.get(self.lookup_field) == 'me'
@@ -37,9 +56,22 @@ class AccountViewSet(ModelViewSet):
         user = self.request.user
         if user.is_anonymous or not user.is_staff:
             queryset = queryset.filter(is_active=True)
-        queryset = limit_filter(self.request, queryset)
+        queryset = super().filter_queryset(queryset)
+
+        return limit_filter(self.request, queryset)
 
-        return super().filter_queryset(queryset)
+    def search(self, request):
+        """Prefix search over usernames, and emails for staff (account.prefix_index)"""
+        params = core.serializers.account.AccountSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        is_staff = request.user.is_staff
+        found = account.prefix_index.index.search(params.validated_data['prefix'], params.validated_data['limit'],
+                                                  emails=is_staff)
+
+        return Response([{'id': pk, 'username': username, 'email': email} if is_staff
+                         else {'id': pk, 'username': username}
+                         for pk, username, email in found])
 
     def get_serializer_class(self):
         action = self.action
@@ -78,18 +110,21 @@ class AccountViewSet(ModelViewSet):
 
     def perform_create(self, serializer):
         user = serializer.save()
-        login(self.request, user)
+        login(self.request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
 
     def perform_update(self, serializer):
         user = serializer.save()
         if self.is_self_lookup():
-            login(self.request, user)
+            login(self.request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
 
     def get_object(self):
         if self.is_self_lookup():
             user = self.request.user
             if user.is_anonymous:
                 self.permission_denied(self.request)
+            if self.request.method not in SAFE_METHODS:
+                # request.user may come from the cache, so save over the current row
+                return Account.objects.get(pk=user.pk)
             return user
         else:
             return super().get_object()
@@ -117,44 +152,102 @@ class AccountViewSet(ModelViewSet):
         return Response({}, 204)
 
 
-class PostViewSet(ModelViewSet):
+class PostViewSet(NDJSONExportMixin, ConditionalGetMixin, ResponseCacheMixin, ExpandRelatedMixin,
+                  CursorPaginationMixin, ModelViewSet):
 
     lookup_field = 'id'
     serializer_class = core.serializers.post.PostSerializer
     queryset = core.models.Post.objects.order_by('-date')
-    filter_backend = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend]
     filter_class = filter_sets.PostFilter
     permission_classes = [core.permissions.PostPermission]
+    cursor_ordering = ('-date', '-id')
+    cursor_actions = ('list', 'feed')
+    version_models = (core.models.PostCategory, core.models.PostComment, core.models.PostReaction)
 
-    def full_partial_update(self, request):
-        instances = core.models.Post.objects.filter(author=request.user)
+    def feed(self, request):
+        return self.conditional_response(request, self.cached_response, self.feed_response)
+
+    def feed_response(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if self.is_cursor_request():
+            return self.cursor_response(queryset)
+
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.action == 'feed':
+            params = core.serializers.feed.FeedParamsSerializer(data=self.request.query_params)
+            params.is_valid(raise_exception=True)
+            queryset = core.repository.annotate_feed(queryset, params.validated_data['comments'])
+
+        return queryset
 
-        serializer = core.serializers.utils.IsActiveSerializer(data=request.data)
+    def get_serializer_class(self):
+        if self.action == 'feed':
+            return core.serializers.feed.FeedPostSerializer
+
+        return self.serializer_class
+
+    def full_partial_update(self, request):
+        serializer = core.serializers.post.PostModerationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        instances.update(**serializer.validated_data)
+        scope = {name: value for name, value in serializer.validated_data.items()
+                 if name in serializer.SCOPE_FIELDS}
+        if not scope:
+            scope = {'author': request.user.pk}
+
+        is_active = serializer.validated_data['is_active']
+        instances = core.repository.filter_posts_scope(core.models.Post.objects.all(), **scope)
+        count = core.repository.update_in_chunks(instances.exclude(is_active=is_active), is_active=is_active)
+
+        if count:
+            core.versions.bump_model_version(core.models.Post)
 
-        return Response({'count': len(instances)})
+        return Response({'count': count})
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def get_serializer(self, *args, **kwargs):
+        is_plain_list = (self.action == 'list' and kwargs.get('many') and args and isinstance(args[0], QuerySet)
+                         and not self.request.query_params.get(EXPAND_PARAM))
+
+        if is_plain_list:
+            return core.serializers.post.PostListValuesSerializer(args[0], context=self.get_serializer_context())
+
+        return super().get_serializer(*args, **kwargs)
+
     def filter_queryset(self, queryset):
         if not self.request.user.is_staff:
             queryset = queryset.filter(is_active=True)
 
-        queryset = limit_filter(self.request, queryset)
+        queryset = super().filter_queryset(queryset)
+
+        if self.is_export_request():
+            return queryset
 
-        return super().filter_queryset(queryset)
+        if self.is_cursor_request():
+            return self.cursor_filter(queryset)
 
+        return limit_filter(self.request, queryset)
 
-class CommentViewSet(ModelViewSet):
+
+class CommentViewSet(NDJSONExportMixin, ConditionalGetMixin, BulkCreateMixin, ObjectPermissionListMixin,
+                     ExpandRelatedMixin, CursorPaginationMixin, ModelViewSet):
     lookup_field = 'id'
     serializer_class = core.serializers.comment.CommentSerializer
     queryset = core.models.PostComment.objects.all()
     filter_backends = [DjangoFilterBackend]
     filter_fields = ['author', 'post']
     permission_classes = [core.permissions.PostCommentPermission]
+    throttle_scope = 'comments'
+    cursor_ordering = ('id',)
+    bulk_serializer_class = core.serializers.comment.BulkCommentSerializer
 
     def get_serializer_class(self):
         if self.action == 'partial_update':
@@ -163,20 +256,80 @@ class CommentViewSet(ModelViewSet):
         return self.serializer_class
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, post=serializer.validated_data.get('post'))
+        # core.signals moves Post.comments_count in the same transaction
+        with transaction.atomic():
+            serializer.save(author=self.request.user, post=serializer.validated_data.get('post'))
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+    def check_bulk_items(self, items):
+        existing_posts = core.repository.get_existing_post_ids({item['post_id'] for item in items})
+
+        return [None if item['post_id'] in existing_posts else _missing_post_error(item['post_id'])
+                for item in items]
+
+    def perform_bulk_create(self, items):
+        comments = super().perform_bulk_create([{**item, 'author': self.request.user} for item in items])
+        core.repository.rebuild_comments_count(
+            core.models.Post.objects.filter(pk__in={comment.post_id for comment in comments}))
+
+        return comments
 
     def filter_queryset(self, queryset):
-        queryset = limit_filter(self.request, queryset)
-        return super().filter_queryset(queryset)
+        queryset = super().filter_queryset(queryset)
+
+        if self.is_export_request():
+            return queryset
+
+        if self.is_cursor_request():
+            return self.cursor_filter(queryset)
+
+        return limit_filter(self.request, queryset)
+
+
+class PostCommentsViewSet(ConditionalGetMixin, ObjectPermissionListMixin, ExpandRelatedMixin, CursorPaginationMixin,
+                          GenericViewSet):
+    """/posts/{id}/comments: keyset pages by id, count from Post.comments_count"""
+    lookup_field = 'id'
+    serializer_class = core.serializers.comment.CommentSerializer
+    queryset = core.models.PostComment.objects.all()
+    filter_backends = []
+    permission_classes = [core.permissions.PostCommentPermission]
+    cursor_ordering = ('id',)
+    cursor_actions = ('comments',)
+    object_permission_actions = ('comments',)
+    version_models = (core.models.Post,)
+
+    def comments(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.comments_response, *args, **kwargs)
+
+    def comments_response(self, request, *args, **kwargs):
+        post_id = self.kwargs[self.lookup_field]
+        if not post_id.isdigit():
+            raise Http404
 
+        count = core.repository.get_post_comments_count(post_id, only_active=not request.user.is_staff)
+        if count is None:
+            raise Http404
 
-class ReactionsViewSet(ModelViewSet):
+        queryset = self.cursor_filter(self.get_queryset().filter(post_id=post_id))
+        rows, next_cursor, prev_cursor = self.paginate_cursor(queryset)
+        serializer = self.get_serializer(rows, many=True)
+
+        return Response({'count': count, 'next': next_cursor, 'prev': prev_cursor, 'results': serializer.data})
+
+
+class ReactionsViewSet(NDJSONExportMixin, BulkCreateMixin, ExpandRelatedMixin, ModelViewSet):
     lookup_field = 'id'
     serializer_class = core.serializers.reaction.ReactionSerializer
     queryset = core.models.PostReaction.objects.all()
     filter_backends = [DjangoFilterBackend]
     filter_fields = ['author', 'post', 'reaction']
     permission_classes = [core.permissions.PostReactionPermission]
+    throttle_scope = 'reactions'
+    bulk_serializer_class = core.serializers.reaction.BulkReactionSerializer
 
     def get_serializer_class(self):
         if self.action == 'partial_update':
@@ -191,13 +344,56 @@ class ReactionsViewSet(ModelViewSet):
         if duplicate.exists():
             raise ValidationError('Reaction to this post already exist')
 
-        serializer.save(author=self.request.user)
+        # core.signals moves the post's reaction counters in the same transaction
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
+
+    def check_bulk_items(self, items):
+        post_ids = {item['post_id'] for item in items}
+        existing_posts = core.repository.get_existing_post_ids(post_ids)
+        reacted_posts = core.repository.get_reacted_post_ids(self.request.user, post_ids)
+        errors = []
+
+        for item in items:
+            post_id = item['post_id']
+            if post_id not in existing_posts:
+                errors.append(_missing_post_error(post_id))
+            elif post_id in reacted_posts:
+                errors.append({'non_field_errors': ['Reaction to this post already exist']})
+            else:
+                reacted_posts.add(post_id)
+                errors.append(None)
+
+        return errors
+
+    def perform_bulk_create(self, items):
+        reactions = super().perform_bulk_create([{**item, 'author': self.request.user} for item in items])
+        core.repository.rebuild_reaction_counters(
+            core.models.Post.objects.filter(pk__in={reaction.post_id for reaction in reactions}))
 
+        return reactions
 
-class PostCategoryViewSet(ModelViewSet):
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+
+class PostCategoryViewSet(ConditionalGetMixin, ModelViewSet):
     serializer_class = core.serializers.category.PostCategorySerializer
     lookup_field = 'id'
     queryset = core.models.PostCategory.objects.all()
     filter_backends = [DjangoFilterBackend]
     permission_classes = [core.permissions.PostCategoryPermission]
     filter_fields = ['name', 'id']
+
+
+class MetricsView(APIView):
+    """Per-route metrics of this process in the Prometheus text format"""
+    permission_classes = [core.permissions.IsStaff]
+
+    def get(self, request):
+        return HttpResponse(core.metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,124 @@
+"""
+Category filters over per-category post bitmaps (bit N is the post with id N) kept in the shared cache.
+
+Bitmaps are keyed on the Post.categories through table version. Without a shared cache the filters
+use EXISTS subqueries instead.
+"""
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+
+from core import versions
+from core.models import Post, PostCategory
+
+CATEGORY_INDEX_TIMEOUT = 3600
+
+# Above this many ids the filter falls back to EXISTS instead of IN
+CATEGORY_INDEX_MAX_IDS = 5000
+
+PostCategories = Post.categories.through
+
+
+def to_bitmap(post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+
+    bits = bytearray(max(post_ids) // 8 + 1)
+    for post_id in post_ids:
+        bits[post_id >> 3] |= 1 << (post_id & 7)
+
+    return int.from_bytes(bits, 'little')
+
+
+def from_bitmap(bitmap):
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+
+    return [index * 8 + bit for index, byte in enumerate(data) if byte for bit in range(8) if byte >> bit & 1]
+
+
+def get_category_bitmaps(category_ids):
+    """{category id: bitmap}; missing bitmaps are built with one query"""
+    token, _ = versions.get_model_versions([PostCategories])[PostCategories]
+    keys = {f'category-posts:{token}:{category_id}': category_id for category_id in category_ids}
+    cached = cache.get_many(keys)
+    bitmaps = {keys[key]: bitmap for key, bitmap in cached.items()}
+
+    missing = [category_id for key, category_id in keys.items() if key not in cached]
+    if missing:
+        post_ids = {category_id: [] for category_id in missing}
+        links = PostCategories.objects.filter(postcategory_id__in=missing).values_list('postcategory_id', 'post_id')
+        for category_id, post_id in links.iterator():
+            post_ids[category_id].append(post_id)
+
+        built = {category_id: to_bitmap(ids) for category_id, ids in post_ids.items()}
+        cache.set_many({f'category-posts:{token}:{category_id}': bitmap for category_id, bitmap in built.items()},
+                       timeout=CATEGORY_INDEX_TIMEOUT)
+        bitmaps.update(built)
+
+    return bitmaps
+
+
+def _union(bitmaps):
+    result = 0
+    for bitmap in bitmaps:
+        result |= bitmap
+
+    return result
+
+
+def _in_categories(category_ids):
+    return Exists(PostCategories.objects.filter(post=OuterRef('pk'), postcategory_id__in=category_ids))
+
+
+def _category_condition(any_of, all_of, none_of):
+    condition = Q()
+    if any_of:
+        condition &= Q(_in_categories(any_of))
+    for category_id in all_of:
+        condition &= Q(_in_categories([category_id]))
+    if none_of:
+        condition &= ~Q(_in_categories(none_of))
+
+    return condition
+
+
+def filter_posts(posts, any_of=(), all_of=(), none_of=()):
+    """Posts in any of any_of, all of all_of and none of none_of (category names)"""
+    names = set(any_of) | set(all_of) | set(none_of)
+    category_ids = dict(PostCategory.objects.filter(name__in=names).values_list('name', 'pk'))
+
+    # An unknown category in all_of, or only unknown ones in any_of, matches nothing
+    if any(name not in category_ids for name in all_of) or (any_of and not category_ids.keys() & set(any_of)):
+        return posts.none()
+
+    any_of = [category_ids[name] for name in any_of if name in category_ids]
+    all_of = [category_ids[name] for name in all_of]
+    none_of = [category_ids[name] for name in none_of if name in category_ids]
+
+    if not versions.is_cache_shared():
+        return posts.filter(_category_condition(any_of, all_of, none_of))
+
+    if not any_of and not all_of:
+        if not none_of:
+            return posts
+
+        excluded = _union(get_category_bitmaps(none_of).values())
+        if excluded.bit_count() > CATEGORY_INDEX_MAX_IDS:
+            return posts.filter(_category_condition(any_of, all_of, none_of))
+
+        return posts.exclude(pk__in=from_bitmap(excluded))
+
+    bitmaps = get_category_bitmaps(set(any_of) | set(all_of) | set(none_of))
+    found = -1
+    if any_of:
+        found &= _union(bitmaps[category_id] for category_id in any_of)
+    for category_id in all_of:
+        found &= bitmaps[category_id]
+    found &= ~_union(bitmaps[category_id] for category_id in none_of)
+
+    if not found:
+        return posts.none()
+    if found.bit_count() > CATEGORY_INDEX_MAX_IDS:
+        return posts.filter(_category_condition(any_of, all_of, none_of))
+
+    return posts.filter(pk__in=from_bitmap(found))
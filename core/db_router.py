@@ -0,0 +1,86 @@
+"""
+Routes reads of safe requests to replicas (settings.REPLICA_DATABASES) and everything else to the primary.
+
+After a write the client gets a cookie and reads from the primary for REPLICA_STICKY_SECONDS.
+"""
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PRIMARY_DB_COOKIE = 'primary_db'
+
+_current_state = contextvars.ContextVar('db_routing_state', default=None)
+
+# {replica alias: (is healthy, checked at)}
+_replica_health = dict()
+
+
+class RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def start_request(use_replica):
+    state = RoutingState(use_replica)
+    return state, _current_state.set(state)
+
+
+def finish_request(token):
+    _current_state.reset(token)
+
+
+def pin_primary():
+    """Sends the remaining reads of the current request to the primary"""
+    state = _current_state.get()
+    if state is not None:
+        state.use_replica = False
+
+
+def is_replica_healthy(alias):
+    healthy, checked_at = _replica_health.get(alias, (False, None))
+    if checked_at is not None and time.monotonic() - checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+        return healthy
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        healthy = True
+    except DatabaseError:
+        connections[alias].close()
+        healthy = False
+
+    _replica_health[alias] = (healthy, time.monotonic())
+    return healthy
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _current_state.get()
+        if state is None or not state.use_replica or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        replicas = [alias for alias in settings.REPLICA_DATABASES if is_replica_healthy(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _current_state.get()
+        if state is not None:
+            state.use_replica = False
+            state.wrote = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
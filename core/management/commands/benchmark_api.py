@@ -0,0 +1,178 @@
+import itertools
+import json
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from account.models import Account
+from core.models import Post, PostCategory, PostComment
+
+
+def get_endpoints():
+    """(name, client, method, path, query params or body) for the core.api.urls routes"""
+    return [
+        ('posts list', 'anonymous', 'get', '/api/posts', {}),
+        ('posts list limit', 'anonymous', 'get', '/api/posts', {'limit': 20}),
+        ('posts list deep offset', 'anonymous', 'get', '/api/posts', {'limit': 20, 'offset': '{deep_offset}'}),
+        ('posts cursor page', 'anonymous', 'get', '/api/posts', {'cursor': '', 'limit': 20}),
+        ('posts expanded', 'anonymous', 'get', '/api/posts', {'limit': 100, 'expand': 'author,categories'}),
+        ('posts filter author', 'anonymous', 'get', '/api/posts', {'author': '{account}', 'limit': 20}),
+        ('posts filter categories', 'anonymous', 'get', '/api/posts',
+         {'categories__in': '{category_name}', 'limit': 20}),
+        ('posts search', 'anonymous', 'get', '/api/posts', {'q': 'django cache', 'limit': 20}),
+        ('posts list staff', 'staff', 'get', '/api/posts', {'limit': 100}),
+        ('post detail', 'anonymous', 'get', '/api/posts/{post}', {}),
+        ('post detail expanded', 'anonymous', 'get', '/api/posts/{post}', {'expand': 'author,categories'}),
+        ('post create', 'staff', 'post', '/api/posts', {'title': 'Benchmark', 'content': 'Benchmark post',
+                                                        'categories': ['{category}']}),
+        ('post update', 'staff', 'patch', '/api/posts/{post}', {'title': 'Benchmark update'}),
+        ('comments list', 'anonymous', 'get', '/api/comments', {'limit': 100}),
+        ('comments of post', 'anonymous', 'get', '/api/comments', {'post': '{post}'}),
+        ('comments expanded', 'anonymous', 'get', '/api/comments', {'limit': 100, 'expand': 'author,post'}),
+        ('comment detail', 'anonymous', 'get', '/api/comments/{comment}', {}),
+        ('comment create', 'user', 'post', '/api/comments', {'post': '{post}', 'content': 'Benchmark comment'}),
+        ('reactions of post', 'anonymous', 'get', '/api/reactions', {'post': '{post}', 'reaction': '+'}),
+        ('reactions expanded', 'anonymous', 'get', '/api/reactions', {'post': '{post}', 'expand': 'post.author,author'}),
+        ('reaction create', 'user', 'post', '/api/reactions', {'post': '{next_post}', 'reaction': '+'}),
+        ('categories list', 'anonymous', 'get', '/api/categories', {}),
+        ('category detail', 'anonymous', 'get', '/api/categories/{category}', {}),
+        ('accounts list', 'anonymous', 'get', '/api/accounts', {'limit': 100}),
+        ('account detail', 'anonymous', 'get', '/api/accounts/{account}', {}),
+        ('account me', 'user', 'get', '/api/accounts/me', {}),
+    ]
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database and measures latency, SQL query count and response size '
+            'of every API endpoint, writing the results to a JSON file')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--output', default='bench_output.json')
+        parser.add_argument('--only', nargs='*', help='Run only endpoints whose name contains one of these words')
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--accounts', type=int, default=200)
+        parser.add_argument('--categories', type=int, default=30)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--reactions', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            call_command('seed_blog', stdout=self.stdout, **{name: options[name] for name in
+                                                             ('accounts', 'categories', 'posts', 'comments',
+                                                              'reactions')})
+            results = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'cold_cache': options['cold_cache'],
+            'volumes': {name: options[name] for name in ('accounts', 'categories', 'posts', 'comments', 'reactions')},
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def get_clients(self):
+        staff = Account.objects.create_user('bench-staff@example.com', 'bench-staff', 'password')
+        staff.is_staff = True
+        staff.save()
+        user = Account.objects.create_user('bench-user@example.com', 'bench-user', 'password')
+
+        clients = {'anonymous': APIClient(), 'staff': APIClient(), 'user': APIClient()}
+        clients['staff'].force_login(staff)
+        clients['user'].force_login(user)
+
+        return clients
+
+    def get_substitutions(self):
+        post = Post.objects.filter(is_active=True).order_by('-date', '-id').first()
+        category = PostCategory.objects.order_by('pk').first()
+
+        return {
+            'post': post.pk,
+            'comment': PostComment.objects.order_by('pk').values_list('pk', flat=True).first(),
+            'category': category.pk,
+            'category_name': category.name,
+            'account': post.author_id,
+            'deep_offset': max(Post.objects.filter(is_active=True).count() - 20, 0),
+        }
+
+    def run_benchmark(self, options):
+        clients = self.get_clients()
+        substitutions = self.get_substitutions()
+        # A post takes one reaction per user, so each iteration moves to the next post. Once all are used
+        # they repeat, and reaction create then measures the duplicate check
+        next_posts = itertools.cycle(Post.objects.order_by('pk').values_list('pk', flat=True))
+        results = dict()
+
+        self.stdout.write(f'{"endpoint":<28} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"bytes":>9}')
+
+        for name, client_name, method, path, params in get_endpoints():
+            if options['only'] and not any(word in name for word in options['only']):
+                continue
+
+            client = getattr(clients[client_name], method)
+            timings, queries = [], []
+
+            for _ in range(options['iterations']):
+                substitutions['next_post'] = next(next_posts)
+                url = path.format(**substitutions)
+                data = {key: self._substitute(value, substitutions) for key, value in params.items()}
+
+                if options['cold_cache']:
+                    cache.clear()
+
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = client(url, data, format='json') if method != 'get' else client(url, data)
+                    content = b''.join(response.streaming_content) if response.streaming else response.content
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(context.captured_queries))
+
+            results[name] = {
+                'method': method.upper(),
+                'path': path,
+                'params': params,
+                'status': response.status_code,
+                'p50_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(_percentile(timings, 95), 3),
+                'mean_ms': round(statistics.mean(timings), 3),
+                'queries': round(statistics.median(queries)),
+                'bytes': len(content),
+            }
+            result = results[name]
+            self.stdout.write(f'{name:<28} {result["status"]:>6} {result["p50_ms"]:>9} {result["p95_ms"]:>9} '
+                              f'{result["queries"]:>8} {result["bytes"]:>9}')
+
+        return results
+
+    @staticmethod
+    def _substitute(value, substitutions):
+        if isinstance(value, list):
+            return [Command._substitute(item, substitutions) for item in value]
+        if isinstance(value, str) and value.startswith('{') and value.endswith('}'):
+            return substitutions[value[1:-1]]
+
+        return value
@@ -0,0 +1,148 @@
+import http.client
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.management.commands.benchmark_api import _percentile
+from core.models import Post, PostCategory
+
+DEFAULT_PATHS = ('/api/posts?limit=20', '/api/posts/{post}', '/api/comments?post={post}',
+                 '/api/reactions?post={post}', '/api/categories')
+
+
+def get_server_commands(workers, port):
+    """The WSGI deployment (gunicorn, sync workers) and the same project under ASGI (uvicorn)"""
+    bind = f'127.0.0.1:{port}'
+    return {
+        'wsgi': [sys.executable, '-m', 'gunicorn', 'tblog.wsgi', '--workers', str(workers), '--bind', bind,
+                 '--log-level', 'warning'],
+        'asgi': [sys.executable, '-m', 'uvicorn', 'tblog.asgi:application', '--workers', str(workers),
+                 '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log'],
+    }
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+
+    return False
+
+
+class Command(BaseCommand):
+    help = ('Starts the project under gunicorn (WSGI) and uvicorn (ASGI) against the configured database '
+            'and compares throughput and latency of concurrent read requests')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', nargs='*', default=DEFAULT_PATHS,
+                            help='Paths to request in turn, {post} and {category} are replaced with existing ids')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per server')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--servers', nargs='*', choices=('wsgi', 'asgi'), default=('wsgi', 'asgi'))
+        parser.add_argument('--output', default='bench_servers.json')
+
+    def handle(self, *args, **options):
+        post = Post.objects.filter(is_active=True).order_by('-date', '-id').values_list('pk', flat=True).first()
+        category = PostCategory.objects.order_by('pk').values_list('pk', flat=True).first()
+        if post is None or category is None:
+            raise CommandError('The database has no posts or categories, run seed_blog first')
+
+        paths = [path.format(post=post, category=category) for path in options['paths']]
+        commands = get_server_commands(options['workers'], options['port'])
+        results = dict()
+
+        self.stdout.write(f'{"server":<6} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"errors":>7}')
+
+        for server in options['servers']:
+            results[server] = self.run_server(commands[server], paths, options)
+            result = results[server]
+            self.stdout.write(f'{server:<6} {result["requests_per_second"]:>9} {result["p50_ms"]:>9} '
+                              f'{result["p95_ms"]:>9} {result["errors"]:>7}')
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'paths': paths,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'workers': options['workers'],
+            'servers': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def run_server(self, command, paths, options):
+        process = subprocess.Popen(command, env=os.environ.copy())
+
+        try:
+            if not wait_for_port(options['port'], timeout=30):
+                raise CommandError(f'Server did not start: {" ".join(command)}')
+
+            # Warm up imports and database connections in every worker
+            self.load(paths, options['port'], options['workers'] * len(paths) * 2, options['concurrency'])
+
+            return self.load(paths, options['port'], options['requests'], options['concurrency'])
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def load(self, paths, port, total, concurrency):
+        counter = itertools.count()
+        timings, errors = [], []
+        lock = threading.Lock()
+
+        def worker():
+            client = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+            while (number := next(counter)) < total:
+                started = time.perf_counter()
+                try:
+                    client.request('GET', paths[number % len(paths)])
+                    response = client.getresponse()
+                    response.read()
+                    failed = response.status >= 500
+                except (OSError, http.client.HTTPException):
+                    client.close()
+                    client = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                    failed = True
+
+                with lock:
+                    timings.append((time.perf_counter() - started) * 1000)
+                    if failed:
+                        errors.append(number)
+
+            client.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'requests_per_second': round(len(timings) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(_percentile(timings, 95), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'errors': len(errors),
+        }
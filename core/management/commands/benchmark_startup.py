@@ -0,0 +1,149 @@
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.management.commands.benchmark_servers import DEFAULT_PATHS
+from core.models import Post, PostCategory
+
+
+def get_server_commands(workers, port):
+    """The old Procfile command and the one with tblog/gunicorn_config.py"""
+    base = [sys.executable, '-m', 'gunicorn', 'tblog.wsgi', '--workers', str(workers),
+            '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+    return {
+        'default': base,
+        'config': base + ['-c', 'python:tblog.gunicorn_config'],
+    }
+
+
+def get_worker_pids(master_pid):
+    pids = []
+
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as stat:
+                parent = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == master_pid:
+            pids.append(int(name))
+
+    return pids
+
+
+def get_private_memory(pid):
+    """Private_Clean + Private_Dirty of the process, in bytes"""
+    private = 0
+
+    with open(f'/proc/{pid}/smaps_rollup') as smaps:
+        for line in smaps:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                private += int(line.split()[1]) * 1024
+
+    return private
+
+
+def request(port, path):
+    client = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    started = time.perf_counter()
+    try:
+        client.request('GET', path)
+        response = client.getresponse()
+        response.read()
+        return response.status, (time.perf_counter() - started) * 1000
+    finally:
+        client.close()
+
+
+class Command(BaseCommand):
+    help = ('Starts gunicorn with and without tblog/gunicorn_config.py and compares the time until the first '
+            'response, first-request latency of each path and private memory of the workers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', nargs='*', default=DEFAULT_PATHS,
+                            help='Paths to request in turn, {post} and {category} are replaced with existing ids')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+        parser.add_argument('--repeat', type=int, default=20, help='Warm requests per path after the first one')
+        parser.add_argument('--port', type=int, default=8766)
+        parser.add_argument('--servers', nargs='*', choices=('default', 'config'), default=('default', 'config'))
+        parser.add_argument('--output', default='bench_startup.json')
+
+    def handle(self, *args, **options):
+        post = Post.objects.filter(is_active=True).order_by('-date', '-id').values_list('pk', flat=True).first()
+        category = PostCategory.objects.order_by('pk').values_list('pk', flat=True).first()
+        if post is None or category is None:
+            raise CommandError('The database has no posts or categories, run seed_blog first')
+
+        paths = [path.format(post=post, category=category) for path in options['paths']]
+        commands = get_server_commands(options['workers'], options['port'])
+        results = dict()
+
+        self.stdout.write(f'{"server":<8} {"ready s":>8} {"first ms":>9} {"warm ms":>8} {"private MB":>11}')
+
+        for server in options['servers']:
+            results[server] = result = self.run_server(commands[server], paths, options)
+            private_mb = '-' if result['workers_private_mb'] is None else result['workers_private_mb']
+            self.stdout.write(f'{server:<8} {result["ready_s"]:>8} {result["first_request_ms"]:>9} '
+                              f'{result["warm_request_ms"]:>8} {private_mb:>11}')
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'paths': paths,
+            'workers': options['workers'],
+            'servers': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def run_server(self, command, paths, options):
+        port = options['port']
+        started = time.perf_counter()
+        process = subprocess.Popen(command, env=os.environ.copy())
+
+        try:
+            ready = self.wait_for_response(port, paths[0], started, timeout=60)
+
+            # The first request of each path lands on a worker that has served nothing yet
+            first = {path: request(port, path)[1] for path in paths}
+            warm = {path: statistics.median(request(port, path)[1] for _ in range(options['repeat'])) for path in paths}
+
+            private = None
+            if os.path.exists('/proc/self/smaps_rollup'):
+                private = sum(get_private_memory(pid) for pid in get_worker_pids(process.pid))
+
+            return {
+                'ready_s': round(ready, 3),
+                'first_request_ms': round(sum(first.values()), 3),
+                'warm_request_ms': round(sum(warm.values()), 3),
+                'first_request_ms_by_path': {path: round(value, 3) for path, value in first.items()},
+                'warm_request_ms_by_path': {path: round(value, 3) for path, value in warm.items()},
+                'workers_private_mb': None if private is None else round(private / 2 ** 20, 1),
+            }
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def wait_for_response(self, port, path, started, timeout):
+        """Seconds from start until path first answers; that request is not measured"""
+        while time.perf_counter() - started < timeout:
+            try:
+                status, _ = request(port, path)
+                if status < 500:
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.05)
+
+        raise CommandError(f'Server did not respond within {timeout}s')
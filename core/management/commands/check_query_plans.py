@@ -0,0 +1,81 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.api import views
+from core.api.utils import encode_cursor
+from core.models import Post
+
+
+def get_checked_queries(post_id):
+    """(name, viewset, path, query params, table that must not be fully scanned)"""
+    return [
+        ('active posts', views.PostViewSet, '/api/posts', {'limit': 20}, 'core_post'),
+        ('active posts, cursor page', views.PostViewSet, '/api/posts',
+         {'cursor': encode_cursor([timezone.now().isoformat(), post_id]), 'limit': 20}, 'core_post'),
+        ('comments of post', views.CommentViewSet, '/api/comments', {'post': post_id, 'cursor': ''},
+         'core_postcomment'),
+        ('reactions of post', views.ReactionsViewSet, '/api/reactions', {'post': post_id, 'reaction': '+'},
+         'core_postreaction'),
+        ('active accounts', views.AccountViewSet, '/api/accounts', {'limit': 20}, 'account_account'),
+    ]
+
+
+SEQUENTIAL_SCAN_PATTERNS = {
+    'postgresql': r'Seq Scan on {table}\b',
+    'sqlite': r'\bSCAN {table}\b(?! USING (COVERING )?INDEX)',
+}
+
+
+def build_queryset(viewset, path, params):
+    request = Request(APIRequestFactory().get(path, params))
+    request.user = AnonymousUser()
+
+    view = viewset(request=request, args=(), kwargs={}, format_kwarg=None, action='list')
+    return view.filter_queryset(view.get_queryset())
+
+
+def explain(queryset):
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # On a small database the planner picks Seq Scan even with a suitable index
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+        return queryset.explain()
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN for the main queries of API viewsets and fails if any of them uses a sequential scan'
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'Query plans are not checked for {connection.vendor}')
+
+        post_id = Post.objects.order_by().values_list('pk', flat=True).first()
+        if post_id is None:
+            raise CommandError('The database has no posts, seed it before checking query plans')
+
+        regressions = []
+
+        for name, viewset, path, params, table in get_checked_queries(post_id):
+            plan = explain(build_queryset(viewset, path, params))
+            is_sequential = re.search(pattern.format(table=table), plan) is not None
+
+            self.stdout.write(f'{"SEQ SCAN" if is_sequential else "ok":<8} {name}')
+            if options['verbosity'] > 1 or is_sequential:
+                self.stdout.write(plan)
+
+            if is_sequential:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f'Sequential scan in: {", ".join(regressions)}')
+
+        self.stdout.write(self.style.SUCCESS('All checked queries use indexes'))
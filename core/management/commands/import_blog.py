@@ -0,0 +1,290 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from account.models import Account
+from core import repository, search, versions
+from core.models import ImportJournal, ImportJournalEntry, Post, PostCategory, PostComment, PostReaction
+
+# (option name, model, field matching an existing row)
+IMPORT_STEPS = (
+    ('accounts', Account, 'email'),
+    ('categories', PostCategory, 'name'),
+    ('posts', Post, None),
+    ('comments', PostComment, None),
+    ('reactions', PostReaction, None),
+)
+
+
+class UnresolvedReference(Exception):
+    pass
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(path):
+    """Rows as dicts: .csv with a header, anything else as NDJSON, optionally .gz"""
+    with _open(path) as file:
+        if path.removesuffix('.gz').endswith('.csv'):
+            yield from csv.DictReader(file)
+            return
+
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+AUTO_DATE_FIELDS = [field for _, model, _ in IMPORT_STEPS for field in model._meta.concrete_fields
+                    if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+
+
+@contextmanager
+def keep_dates(fields):
+    """Turns off auto_now/auto_now_add so dates from the file are kept"""
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class ImportState:
+    """
+    Import progress in ImportJournal. Each batch's journal entry is saved in the batch transaction,
+    so a rerun replays the journal and resumes from the first unsaved batch.
+    """
+
+    def __init__(self, name, files, restart=False):
+        self.done = {step: 0 for step in files}
+        self.ids = {model: {} for _, model, _ in IMPORT_STEPS}
+        self.post_ids = {step: set() for step in files}
+
+        if restart:
+            ImportJournal.objects.filter(name=name).delete()
+
+        self.journal, created = ImportJournal.objects.get_or_create(name=name, defaults={'files': files})
+        if created:
+            return
+
+        if self.journal.files != files:
+            raise CommandError(f'Journal {name} belongs to another import, pass --restart to start over')
+
+        for entry in self.journal.entries.order_by('pk'):
+            self.apply(entry.step, entry.done, entry.ids, entry.post_ids)
+
+    def apply(self, step, done, ids, post_ids):
+        model = next(model for name, model, _ in IMPORT_STEPS if name == step)
+        self.done[step] = done
+        self.ids[model].update(ids)
+        self.post_ids[step].update(post_ids)
+
+    def save(self, step, done, ids, post_ids):
+        # Called inside the batch transaction; memory state only changes after the commit
+        post_ids = sorted(post_ids)
+        ImportJournalEntry.objects.create(journal=self.journal, step=step, done=done, ids=ids, post_ids=post_ids)
+        transaction.on_commit(lambda: self.apply(step, done, ids, post_ids))
+
+    def finish(self):
+        self.journal.delete()
+
+
+class Command(BaseCommand):
+    help = ('Imports accounts, categories, posts, comments and reactions from NDJSON or CSV files '
+            '(the format of ?export=ndjson) with bulk inserts')
+
+    def add_arguments(self, parser):
+        for name, model, _ in IMPORT_STEPS:
+            parser.add_argument(f'--{name}', metavar='FILE', help=f'{model.__name__} rows, .ndjson/.csv, optionally .gz')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--state', default='import_blog',
+                            help='Name of the progress journal (stored in the database) used to resume an interrupted import')
+        parser.add_argument('--restart', action='store_true', help='Ignore the progress journal and start over')
+
+    def handle(self, *args, **options):
+        files = {name: os.path.abspath(options[name]) for name, _, _ in IMPORT_STEPS if options[name]}
+        if not files:
+            raise CommandError('Nothing to import, pass at least one of ' +
+                               ', '.join(f'--{name}' for name, _, _ in IMPORT_STEPS))
+
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        self.state = ImportState(options['state'], files, options['restart'])
+        self.unusable_password = make_password(None)
+
+        with keep_dates(AUTO_DATE_FIELDS):
+            for name, model, natural_key in IMPORT_STEPS:
+                if name in files:
+                    self.import_file(name, model, natural_key, files[name])
+
+        self.stdout.write('Rebuilding derived data...')
+        imported = [model for name, model, _ in IMPORT_STEPS if name in files]
+        # Includes batches saved by an interrupted run
+        for step, rebuild in (('reactions', repository.rebuild_reaction_counters),
+                              ('comments', repository.rebuild_comments_count)):
+            post_ids = sorted(self.state.post_ids.get(step, ()))
+            for start in range(0, len(post_ids), self.batch_size):
+                rebuild(Post.objects.filter(pk__in=post_ids[start:start + self.batch_size]))
+        if Post in imported:
+            search.rebuild_index()
+            imported.append(Post.categories.through)
+        versions.bump_model_version(*imported)
+
+        self.state.finish()
+        self.stdout.write(self.style.SUCCESS('Import finished'))
+
+    def import_file(self, name, model, natural_key, path):
+        done = self.state.done[name]
+        rows = islice(read_rows(path), done, None)
+        created = matched = skipped = 0
+        started = time.monotonic()
+
+        while batch := list(islice(rows, self.batch_size)):
+            try:
+                with transaction.atomic():
+                    batch_created, batch_matched, batch_skipped, ids, post_ids = self.import_batch(
+                        model, natural_key, batch)
+                    self.state.save(name, done + len(batch), ids, post_ids)
+            except (DatabaseError, ValidationError) as exc:
+                raise CommandError(f'{name}: rows {done + 1}-{done + len(batch)} failed: {exc}. '
+                                   f'Fix the file and run the command again to resume from this batch')
+
+            done += len(batch)
+            created += batch_created
+            matched += batch_matched
+            skipped += batch_skipped
+
+            if self.verbosity > 1:
+                self.stdout.write(f'{name}: {done} rows')
+
+        elapsed = time.monotonic() - started
+        rate = (created + matched + skipped) / elapsed if elapsed else 0
+        self.stdout.write(f'{name}: {created} created, {matched} matched existing, {skipped} skipped '
+                          f'(unresolved references) in {elapsed:.1f}s ({rate:.0f} rows/s)')
+
+    def import_batch(self, model, natural_key, batch):
+        objects, source_ids, categories = [], [], []
+        skipped = 0
+
+        for row in batch:
+            try:
+                obj = self.build(model, row)
+                if model is Post:
+                    categories.append(self.resolve_many(Post.categories.field, row.get('categories')))
+            except UnresolvedReference:
+                skipped += 1
+                continue
+
+            objects.append(obj)
+            source_ids.append(str(row['id']) if row.get('id') not in (None, '') else None)
+
+        ids = {}
+        if natural_key:
+            # Rows already in the database or repeated in the batch are matched, not created
+            existing = dict(model.objects.filter(**{f'{natural_key}__in': [getattr(obj, natural_key) for obj in objects]})
+                            .values_list(natural_key, 'pk'))
+            new_objects, new_source_ids, duplicates = [], [], []
+            for obj, source_id in zip(objects, source_ids):
+                key = getattr(obj, natural_key)
+                if key in existing:
+                    duplicates.append((source_id, key))
+                    continue
+                existing[key] = None
+                new_objects.append(obj)
+                new_source_ids.append(source_id)
+            objects, source_ids = new_objects, new_source_ids
+        else:
+            duplicates = []
+
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size,
+                                            ignore_conflicts=model is PostReaction)
+
+        if model is not PostReaction:
+            ids.update({source_id: obj.pk for source_id, obj in zip(source_ids, created) if source_id})
+        if duplicates:
+            pks = dict(model.objects.filter(**{f'{natural_key}__in': [key for _, key in duplicates]})
+                       .values_list(natural_key, 'pk'))
+            ids.update({source_id: pks[key] for source_id, key in duplicates if source_id})
+
+        if model is Post:
+            through = Post.categories.through
+            links = [through(post_id=post.pk, postcategory_id=category_id)
+                     for post, category_ids in zip(created, categories)
+                     for category_id in category_ids]
+            through.objects.bulk_create(links, batch_size=self.batch_size)
+        post_ids = {obj.post_id for obj in objects} if model in (PostComment, PostReaction) else set()
+
+        return len(objects), len(duplicates), skipped, ids, post_ids
+
+    def build(self, model, row):
+        values = {}
+
+        for field in model._meta.concrete_fields:
+            if field.primary_key:
+                continue
+
+            key = next((key for key in (field.name, field.attname) if key in row), None)
+            if key is None:
+                continue
+
+            value = row[key]
+            if field.is_relation:
+                values[field.attname] = self.resolve(field.related_model, value)
+            elif value in (None, '') and field.null:
+                values[field.attname] = None
+            else:
+                values[field.attname] = self.convert(field, value)
+
+        if model is Account and not values.get('password'):
+            values['password'] = self.unusable_password
+        for field in AUTO_DATE_FIELDS:
+            # keep_dates turns off auto_now/auto_now_add, so fill in missing dates here
+            if field.model is model and values.get(field.attname) is None:
+                values[field.attname] = timezone.now()
+
+        return model(**values)
+
+    def convert(self, field, value):
+        value = field.to_python(value)
+        if isinstance(value, datetime.datetime) and settings.USE_TZ and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+
+        return value
+
+    def resolve(self, model, source_id):
+        pk = self.state.ids[model].get(str(source_id))
+        if pk is None:
+            raise UnresolvedReference(model, source_id)
+
+        return pk
+
+    def resolve_many(self, field, source_ids):
+        if source_ids in (None, ''):
+            return []
+        if isinstance(source_ids, str):
+            # CSV lists category ids separated by ";"
+            source_ids = [source_id for source_id in source_ids.split(';') if source_id.strip()]
+
+        return [self.resolve(field.related_model, source_id.strip() if isinstance(source_id, str) else source_id)
+                for source_id in source_ids]
+
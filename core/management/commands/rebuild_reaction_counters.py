@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import repository
+from core.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recalculates likes_count/dislikes_count and comments_count of posts from the reactions and comments tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_ids', nargs='*', type=int, help='Rebuild only these posts')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if options['post_ids']:
+            posts = posts.filter(pk__in=options['post_ids'])
+
+        updated = repository.rebuild_reaction_counters(posts)
+        repository.rebuild_comments_count(posts)
+        self.stdout.write(self.style.SUCCESS(f'Reaction and comment counters rebuilt for {updated} posts'))
@@ -0,0 +1,90 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from account.models import Account
+from core import repository, search, versions
+from core.models import Post, PostCategory, PostComment, PostReaction
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with generated accounts, categories, posts, comments and reactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=100)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--reactions', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        with transaction.atomic():
+            accounts = self.create_accounts(options['accounts'])
+            categories = self.create_categories(options['categories'])
+            posts = self.create_posts(options['posts'], accounts, categories)
+            self.create_comments(options['comments'], accounts, posts)
+            self.create_reactions(options['reactions'], accounts, posts)
+
+            repository.rebuild_reaction_counters(Post.objects.filter(pk__in=posts))
+            repository.rebuild_comments_count(Post.objects.filter(pk__in=posts))
+            search.rebuild_index()
+            versions.bump_model_version(Account, PostCategory, Post, Post.categories.through, PostComment, PostReaction)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(accounts)} accounts, {len(categories)} categories, {len(posts)} posts, '
+            f'{options["comments"]} comments, {min(options["reactions"], len(accounts) * len(posts))} reactions'))
+
+    def create_accounts(self, count):
+        # Hashing is slow, so every seeded account shares the password "password"
+        password = make_password('password')
+        start = Account.objects.count()
+        accounts = [Account(email=f'seed{index}@example.com', username=f'seed{index}', password=password,
+                            is_active=self.random.random() > 0.05)
+                    for index in range(start, start + count)]
+
+        return [account.pk for account in Account.objects.bulk_create(accounts, batch_size=self.batch_size)]
+
+    def create_categories(self, count):
+        start = PostCategory.objects.count()
+        categories = [PostCategory(name=f'category-{index}') for index in range(start, start + count)]
+
+        return [category.pk for category in PostCategory.objects.bulk_create(categories, batch_size=self.batch_size)]
+
+    def create_posts(self, count, accounts, categories):
+        words = ('blog', 'post', 'django', 'api', 'cache', 'index', 'query', 'python', 'news', 'review')
+        posts = [Post(author_id=self.random.choice(accounts),
+                      title=' '.join(self.random.choices(words, k=4)),
+                      content=' '.join(self.random.choices(words, k=60)),
+                      is_active=self.random.random() > 0.1)
+                 for _ in range(count)]
+        posts = [post.pk for post in Post.objects.bulk_create(posts, batch_size=self.batch_size)]
+
+        through = Post.categories.through
+        links = [through(post_id=post_id, postcategory_id=category_id)
+                 for post_id in posts
+                 for category_id in self.random.sample(categories, k=min(len(categories), self.random.randint(0, 3)))]
+        through.objects.bulk_create(links, batch_size=self.batch_size)
+
+        return posts
+
+    def create_comments(self, count, accounts, posts):
+        comments = (PostComment(author_id=self.random.choice(accounts), post_id=self.random.choice(posts),
+                                content=f'Comment {index}')
+                    for index in range(count))
+        PostComment.objects.bulk_create(comments, batch_size=self.batch_size)
+
+    def create_reactions(self, count, accounts, posts):
+        # (author, post) is unique, so sample distinct pair numbers
+        pairs = self.random.sample(range(len(accounts) * len(posts)), min(count, len(accounts) * len(posts)))
+        reactions = (PostReaction(author_id=accounts[pair % len(accounts)],
+                                  post_id=posts[pair // len(accounts)],
+                                  reaction=self.random.choice('++-'))
+                     for pair in pairs)
+        PostReaction.objects.bulk_create(reactions, batch_size=self.batch_size)
@@ -0,0 +1,128 @@
+"""
+Per-request timings for Server-Timing and per-route histograms of this process for Prometheus.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_request_metrics = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - started
+
+
+def start_request_metrics():
+    metrics = RequestMetrics()
+    return metrics, _current_request_metrics.set(metrics)
+
+
+def finish_request_metrics(token):
+    _current_request_metrics.reset(token)
+
+
+def get_request_metrics():
+    return _current_request_metrics.get()
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    # The request comes from a contextvar, so sync_to_async threads with their own connections are counted too
+    request_metrics = get_request_metrics()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+
+    return request_metrics.sql_wrapper(execute, sql, params, many, context)
+
+
+def install_sql_wrapper(connection):
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+class RouteHistogram:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.response_bytes = 0
+
+    def observe(self, duration, sql_count, sql_time, response_bytes):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+        self.count += 1
+        self.duration += duration
+        self.sql_count += sql_count
+        self.sql_time += sql_time
+        self.response_bytes += response_bytes
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._routes = defaultdict(RouteHistogram)
+        self._lock = threading.Lock()
+
+    def observe(self, method, route, duration, sql_count, sql_time, response_bytes):
+        with self._lock:
+            self._routes[(method, route)].observe(duration, sql_count, sql_time, response_bytes)
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4"""
+        lines = [
+            '# HELP tblog_http_request_duration_seconds Request latency by route',
+            '# TYPE tblog_http_request_duration_seconds histogram',
+        ]
+        totals = []
+
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            for (method, route), histogram in routes:
+                labels = f'method="{method}",route="{_escape(route)}"'
+                cumulative = 0
+
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram.buckets):
+                    cumulative += count
+                    lines.append(f'tblog_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+
+                lines.append(f'tblog_http_request_duration_seconds_sum{{{labels}}} {histogram.duration}')
+                lines.append(f'tblog_http_request_duration_seconds_count{{{labels}}} {histogram.count}')
+                totals.append((labels, histogram))
+
+        for name, attribute, help_text in (
+                ('tblog_http_request_sql_queries_total', 'sql_count', 'SQL queries executed by route'),
+                ('tblog_http_request_sql_seconds_total', 'sql_time', 'Time spent in SQL by route'),
+                ('tblog_http_response_bytes_total', 'response_bytes', 'Response body bytes by route')):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{name}{{{labels}}} {getattr(histogram, attribute)}' for labels, histogram in totals)
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import whitenoise.middleware
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+from core import db_router, metrics
+
+
+class RequestMetricsMiddleware:
+    """Sends SQL, view and serializer timings in Server-Timing and records them in core.metrics.registry"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Stay in the event loop under ASGI instead of moving async views to a thread
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        request_metrics, token = metrics.start_request_metrics()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request_metrics(token)
+
+        return self.process_metrics(request, response, request_metrics)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request_metrics()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request_metrics(token)
+
+        return self.process_metrics(request, response, request_metrics)
+
+    def process_metrics(self, request, response, request_metrics):
+        finished = time.perf_counter()
+        total = finished - request_metrics.started
+        view = finished - request_metrics.view_started if request_metrics.view_started else 0.0
+        response_bytes = 0 if response.streaming else len(response.content)
+
+        response['Server-Timing'] = ', '.join((
+            f'sql;dur={request_metrics.sql_time * 1000:.2f};desc="{request_metrics.sql_count} queries"',
+            f'serializer;dur={request_metrics.serializer_time * 1000:.2f}',
+            f'view;dur={view * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+            f'response;desc="{response_bytes} bytes"',
+        ))
+
+        resolver_match = request.resolver_match
+        if resolver_match is not None:
+            metrics.registry.observe(request.method, resolver_match.route, total,
+                                     request_metrics.sql_count, request_metrics.sql_time, response_bytes)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request_metrics = metrics.get_request_metrics()
+        if request_metrics is not None:
+            request_metrics.view_started = time.perf_counter()
+
+
+class WhiteNoiseMiddleware(whitenoise.middleware.WhiteNoiseMiddleware):
+    """WhiteNoise 6.0 is sync only; this looks up static files in the event loop and only reads files in a thread"""
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=whitenoise.middleware.settings):
+        super().__init__(get_response, settings)
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """Lets safe requests read from replicas and sets the primary cookie after writes (core.db_router)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        state, token = db_router.start_request(self.can_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.finish_request(token)
+
+        return self.process_routing(request, response, state)
+
+    async def __acall__(self, request):
+        state, token = db_router.start_request(self.can_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_router.finish_request(token)
+
+        return self.process_routing(request, response, state)
+
+    def can_use_replica(self, request):
+        return (bool(settings.REPLICA_DATABASES) and request.method in SAFE_METHODS
+                and db_router.PRIMARY_DB_COOKIE not in request.COOKIES)
+
+    def process_routing(self, request, response, state):
+        if state.wrote or request.method not in SAFE_METHODS:
+            response.set_cookie(db_router.PRIMARY_DB_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+
+        return response
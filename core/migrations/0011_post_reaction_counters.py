@@ -0,0 +1,38 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_reaction_counters(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    PostReaction = apps.get_model('core', 'PostReaction')
+
+    def count(reaction):
+        reactions = (PostReaction.objects.filter(post=OuterRef('pk'), reaction=reaction)
+                     .order_by().values('post').annotate(count=Count('id')).values('count'))
+        return Coalesce(Subquery(reactions), 0)
+
+    Post.objects.update(likes_count=count('+'), dislikes_count=count('-'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_alter_post_categories'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_reaction_counters, migrations.RunPython.noop),
+    ]
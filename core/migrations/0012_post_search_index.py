@@ -0,0 +1,38 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:20
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE core_post ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple'::regconfig, coalesce(content, '')), 'B')) STORED"
+        )
+        schema_editor.execute('CREATE INDEX core_post_search_vector_idx ON core_post USING gin (search_vector)')
+    elif vendor == 'sqlite':
+        schema_editor.execute('CREATE VIRTUAL TABLE core_post_fts USING fts5(title, content)')
+        schema_editor.execute('INSERT INTO core_post_fts(rowid, title, content) SELECT id, title, content FROM core_post')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE core_post DROP COLUMN search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE core_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_post_reaction_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
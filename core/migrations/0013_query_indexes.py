@@ -0,0 +1,25 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-date', '-id'], name='core_post_active_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['post', 'id'], name='core_comment_post_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postreaction',
+            index=models.Index(fields=['post', 'reaction'], name='core_reaction_post_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='postcategory',
+            options={'ordering': ['id']},
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.0.2 on 2026-10-18 18:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comments_count(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    PostComment = apps.get_model('core', 'PostComment')
+
+    comments = (PostComment.objects.filter(post=OuterRef('pk'))
+                .order_by().values('post').annotate(count=Count('id')).values('count'))
+    Post.objects.update(comments_count=Coalesce(Subquery(comments), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_postcategory_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
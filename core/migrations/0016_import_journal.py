@@ -0,0 +1,33 @@
+# Generated by Django 4.0.2 on 2026-10-18 19:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJournal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('files', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImportJournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.CharField(max_length=32)),
+                ('done', models.PositiveIntegerField()),
+                ('ids', models.JSONField(default=dict)),
+                ('post_ids', models.JSONField(default=list)),
+                ('journal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='core.importjournal')),
+            ],
+        ),
+    ]
@@ -27,6 +27,9 @@ class PostCategory(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        ordering = ['id']
+
 
 class Post(models.Model):
     id = models.AutoField(primary_key=True)
@@ -39,11 +42,19 @@ class Post(models.Model):
     date = models.DateTimeField(auto_now_add=True, null=False, blank=False)
     is_active = models.BooleanField(null=False, default=True)
 
+    likes_count = models.PositiveIntegerField(null=False, default=0)
+    dislikes_count = models.PositiveIntegerField(null=False, default=0)
+    comments_count = models.PositiveIntegerField(null=False, default=0)
+
     def __str__(self):
         return f'Post "{self.title}" by {self.author.username} at {self.date.date()}'
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['-date', '-id'], condition=models.Q(is_active=True),
+                         name='core_post_active_date_idx'),
+        ]
 
 
 class PostComment(models.Model):
@@ -53,6 +64,11 @@ class PostComment(models.Model):
 
     content = models.TextField(null=False, blank=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'id'], name='core_comment_post_id_idx'),
+        ]
+
 
 class PostReaction(models.Model):
     REACTION_CHOICES = [
@@ -68,3 +84,21 @@ class PostReaction(models.Model):
 
     class Meta:
         unique_together = ('author', 'post')
+        indexes = [
+            models.Index(fields=['post', 'reaction'], name='core_reaction_post_idx'),
+        ]
+
+
+class ImportJournal(models.Model):
+    """An unfinished import_blog run"""
+    name = models.CharField(max_length=255, unique=True)
+    files = models.JSONField(default=dict)
+
+
+class ImportJournalEntry(models.Model):
+    """An import batch, saved in the same transaction as its rows"""
+    journal = models.ForeignKey(ImportJournal, on_delete=models.CASCADE, related_name='entries')
+    step = models.CharField(max_length=32)
+    done = models.PositiveIntegerField()
+    ids = models.JSONField(default=dict)
+    post_ids = models.JSONField(default=list)
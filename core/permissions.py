@@ -1,6 +1,21 @@
 from rest_framework import permissions
 
 
+class BatchObjectPermission(permissions.BasePermission):
+    """filter_queryset applies the object permissions to list querysets"""
+
+    def filter_queryset(self, request, view, queryset):
+        return queryset
+
+
+def filter_permitted(request, view, queryset):
+    for permission in view.get_permissions():
+        if isinstance(permission, BatchObjectPermission):
+            queryset = permission.filter_queryset(request, view, queryset)
+
+    return queryset
+
+
 class IsBlogOwnerOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         user = request.user if not request.user.is_anonymous else False
@@ -31,7 +46,12 @@ class IsStaffOrReadOnly(permissions.BasePermission):
         return user and user.is_staff
 
 
-class IsAccountOwner(permissions.BasePermission):
+class IsStaff(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return not request.user.is_anonymous and request.user.is_staff
+
+
+class IsAccountOwner(BatchObjectPermission):
     """
     Object-level permission to only allow owners of an object to edit it.
     Assumes the model instance has an `owner` attribute.
@@ -40,7 +60,7 @@ class IsAccountOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_anonymous:
             return False
-        return obj.username == request.user.username
+        return obj.pk == request.user.pk
 
 
 class IsStaffOrPostOnly(permissions.BasePermission):
@@ -63,7 +83,7 @@ class PostOnly(permissions.BasePermission):
         return request.method == 'POST'
 
 
-class AccountPermission(permissions.BasePermission):
+class AccountPermission(BatchObjectPermission):
 
     def has_object_permission(self, request, view, obj):
         if request.method in ('POST', 'OPTIONS', 'HEAD'):
@@ -79,10 +99,10 @@ class AccountPermission(permissions.BasePermission):
         if request.user.is_anonymous:
             return False
 
-        return obj.username == user.username
+        return obj.pk == user.pk
 
 
-class MyAccountPermission(permissions.BasePermission):
+class MyAccountPermission(BatchObjectPermission):
     def has_permission(self, request, view):
         if request.method == 'POST':
             return True
@@ -90,7 +110,7 @@ class MyAccountPermission(permissions.BasePermission):
         return not request.user.is_anonymous
 
     def has_object_permission(self, request, view, obj):
-        return obj.username == request.user.username
+        return obj.pk == request.user.pk
 
 
 class PostCategoryPermission(permissions.BasePermission):
@@ -105,7 +125,7 @@ class PostCategoryPermission(permissions.BasePermission):
         return user.is_staff
 
 
-class PostReactionPermission(permissions.BasePermission):
+class PostReactionPermission(BatchObjectPermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
@@ -114,11 +134,12 @@ class PostReactionPermission(permissions.BasePermission):
         else:
             return False
 
+    # Reaction lists are public, so filter_queryset is not overridden
     def has_object_permission(self, request, view, obj):
-        return obj.author.username == request.user.username
+        return obj.author_id == request.user.pk
 
 
-class PostCommentPermission(permissions.BasePermission):
+class PostCommentPermission(BatchObjectPermission):
     def has_permission(self, request, view):
         user = request.user
 
@@ -137,7 +158,17 @@ class PostCommentPermission(permissions.BasePermission):
 
         is_user_privileged = user.is_staff
 
-        return is_user_privileged or (obj.author.username == request.user.username)
+        return is_user_privileged or obj.author_id == user.pk
+
+    def filter_queryset(self, request, view, queryset):
+        user = request.user
+
+        if request.method in permissions.SAFE_METHODS or user.is_staff:
+            return queryset
+        elif user.is_anonymous:
+            return queryset.none()
+
+        return queryset.filter(author_id=user.pk)
 
 
 class PostPermission(permissions.BasePermission):
@@ -1,9 +1,178 @@
-from core.models import Preference, Limit
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+
+from core import versions
+from core.models import Preference, Limit, Post, PostComment, PostReaction
+
+REACTION_COUNTER_FIELDS = {'+': 'likes_count', '-': 'dislikes_count'}
+UPDATE_CHUNK_SIZE = 5000
+
+_settings_cache = {'preferences': {}, 'limits': {}, 'versions': None, 'loaded_at': None}
+_settings_cache_lock = threading.Lock()
+
+
+def _get_settings_versions():
+    # A process-local cache only sees this process's writes, and invalidate_preferences already covers those
+    if not versions.is_cache_shared():
+        return None
+
+    return tuple(token for token, _ in versions.get_model_versions([Preference, Limit]).values())
+
+
+def load_preferences():
+    settings_versions = _get_settings_versions()
+    preferences = dict(Preference.objects.values_list('name', 'value'))
+    limits = dict(Limit.objects.values_list('name', 'value'))
+
+    with _settings_cache_lock:
+        _settings_cache.update(preferences=preferences, limits=limits, versions=settings_versions,
+                               loaded_at=time.monotonic())
+
+
+def invalidate_preferences():
+    with _settings_cache_lock:
+        _settings_cache['loaded_at'] = None
+
+
+def _get_settings_cache():
+    loaded_at = _settings_cache['loaded_at']
+
+    if (loaded_at is None or time.monotonic() - loaded_at > settings.PREFERENCES_CACHE_TTL
+            or _settings_cache['versions'] != _get_settings_versions()):
+        load_preferences()
+
+    return _settings_cache
 
 
 def get_preferences_unlazy(pref_list):
-    return list(Preference.objects.filter(name__in=pref_list).values_list('value', flat=True))
+    preferences = _get_settings_cache()['preferences']
+    return [preferences[name] for name in pref_list if name in preferences]
 
 
 def get_limit(limit_name):
-    return Limit.objects.get(name=limit_name).value
+    limits = _get_settings_cache()['limits']
+
+    if limit_name not in limits:
+        raise Limit.DoesNotExist(f'Limit {limit_name} does not exist')
+
+    return limits[limit_name]
+
+
+def get_existing_post_ids(post_ids):
+    return set(Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True))
+
+
+def get_reacted_post_ids(author, post_ids):
+    return set(PostReaction.objects.filter(author=author, post_id__in=post_ids).values_list('post_id', flat=True))
+
+
+def change_reaction_counters(post_id, added=None, removed=None):
+    if added == removed:
+        return
+
+    updates = dict()
+    if added is not None:
+        updates[REACTION_COUNTER_FIELDS[added]] = F(REACTION_COUNTER_FIELDS[added]) + 1
+    if removed is not None:
+        updates[REACTION_COUNTER_FIELDS[removed]] = F(REACTION_COUNTER_FIELDS[removed]) - 1
+
+    Post.objects.filter(pk=post_id).update(**updates)
+    versions.bump_model_version(Post)
+
+
+def _reaction_count_subquery(reaction):
+    reactions = (PostReaction.objects.filter(post=OuterRef('pk'), reaction=reaction)
+                 .order_by()
+                 .values('post')
+                 .annotate(count=Count('id'))
+                 .values('count'))
+    return Coalesce(Subquery(reactions), 0)
+
+
+def rebuild_reaction_counters(posts=None):
+    """Recounts the reaction counters with one UPDATE, returns the number of posts"""
+    if posts is None:
+        posts = Post.objects.all()
+
+    updated = posts.update(**{field: _reaction_count_subquery(reaction)
+                              for reaction, field in REACTION_COUNTER_FIELDS.items()})
+    versions.bump_model_version(Post)
+
+    return updated
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(comments_count=F('comments_count') + delta)
+    versions.bump_model_version(Post)
+
+
+def rebuild_comments_count(posts=None):
+    """Recounts comments_count with one UPDATE, returns the number of posts"""
+    if posts is None:
+        posts = Post.objects.all()
+
+    comments = (PostComment.objects.filter(post=OuterRef('pk'))
+                .order_by()
+                .values('post')
+                .annotate(count=Count('id'))
+                .values('count'))
+    updated = posts.update(comments_count=Coalesce(Subquery(comments), 0))
+    versions.bump_model_version(Post)
+
+    return updated
+
+
+def get_post_comments_count(post_id, only_active=False):
+    """comments_count of the post, or None if there is no such post"""
+    posts = Post.objects.filter(pk=post_id)
+    if only_active:
+        posts = posts.filter(is_active=True)
+
+    return posts.values_list('comments_count', flat=True).first()
+
+
+def filter_posts_scope(posts, author=None, categories=None, date_from=None, date_to=None, title=None):
+    if author is not None:
+        posts = posts.filter(author_id=author)
+    if categories:
+        # Exists rather than a join, so a post in several categories is returned once
+        links = Post.categories.through.objects.filter(post=OuterRef('pk'), postcategory_id__in=categories)
+        posts = posts.filter(Exists(links))
+    if date_from is not None:
+        posts = posts.filter(date__gte=date_from)
+    if date_to is not None:
+        posts = posts.filter(date__lte=date_to)
+    if title:
+        posts = posts.filter(title__icontains=title)
+
+    return posts
+
+
+def update_in_chunks(queryset, chunk_size=UPDATE_CHUNK_SIZE, **values):
+    """Updates queryset in pk-ordered chunks so large updates don't hold locks for long"""
+    queryset = queryset.order_by()
+    updated = 0
+
+    while True:
+        boundary = list(queryset.order_by('pk').values_list('pk', flat=True)[chunk_size - 1:chunk_size])
+        if not boundary:
+            return updated + queryset.update(**values)
+
+        updated += queryset.filter(pk__lte=boundary[0]).update(**values)
+        queryset = queryset.filter(pk__gt=boundary[0])
+
+
+def annotate_feed(posts, comments_limit):
+    """Prefetches the first comments_limit comments of each post into first_comments"""
+    if comments_limit:
+        # Limit per post, not per page; the subquery uses core_comment_post_id_idx
+        first_ids = PostComment.objects.filter(post=OuterRef('post')).order_by('id').values('id')[:comments_limit]
+        first_comments = PostComment.objects.filter(id__in=Subquery(first_ids)).order_by('id')
+    else:
+        first_comments = PostComment.objects.none()
+
+    return posts.prefetch_related(Prefetch('postcomment_set', queryset=first_comments, to_attr='first_comments'))
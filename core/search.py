@@ -0,0 +1,79 @@
+"""
+Full-text search over posts.
+
+PostgreSQL uses the generated tsvector column core_post.search_vector with a GIN index. SQLite uses
+the FTS5 table core_post_fts, kept in sync by signals. Both come from migration 0012.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from core.models import Post
+
+SEARCH_CONFIG = 'simple'
+FTS_TABLE = 'core_post_fts'
+
+
+def _vendor(using):
+    return connections[using].vendor
+
+
+def _fts_match_query(query):
+    """Quotes user input into an FTS5 query that requires every word"""
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+def search_posts(queryset, query):
+    table = Post._meta.db_table
+    vendor = _vendor(queryset.db)
+
+    if vendor == 'postgresql':
+        tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+        params = (SEARCH_CONFIG, query)
+        condition = RawSQL(f'{table}.search_vector @@ {tsquery}', params, output_field=BooleanField())
+        rank = RawSQL(f'ts_rank({table}.search_vector, {tsquery})', params, output_field=FloatField())
+    elif vendor == 'sqlite':
+        match = _fts_match_query(query)
+        if not match:
+            return queryset.none()
+
+        condition = RawSQL(f'{table}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+                           (match,), output_field=BooleanField())
+        rank = RawSQL(f'(SELECT -bm25({FTS_TABLE}, 2.0, 1.0) FROM {FTS_TABLE} '
+                      f'WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id)',
+                      (match,), output_field=FloatField())
+    else:
+        return (queryset.filter(title__icontains=query) | queryset.filter(content__icontains=query)).distinct()
+
+    return queryset.filter(condition).annotate(search_rank=rank).order_by('-search_rank', '-date')
+
+
+def index_post(post, using='default'):
+    if _vendor(using) != 'sqlite':
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (post.pk,))
+        cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (%s, %s, %s)',
+                       (post.pk, post.title, post.content))
+
+
+def unindex_post(post_id, using='default'):
+    if _vendor(using) != 'sqlite':
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (post_id,))
+
+
+def rebuild_index(using='default'):
+    """Refills the index, needed after bulk_create and other changes that bypass signals"""
+    if _vendor(using) != 'sqlite':
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, title, content) '
+                       f'SELECT id, title, content FROM {Post._meta.db_table}')
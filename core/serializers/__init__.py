@@ -1 +1 @@
-__all__ = ['account', 'category', 'comment', 'post', 'reaction', 'utils']
\ No newline at end of file
+__all__ = ['account', 'category', 'comment', 'feed', 'post', 'reaction', 'utils']
\ No newline at end of file
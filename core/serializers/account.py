@@ -4,6 +4,7 @@ from rest_flex_fields import FlexFieldsModelSerializer
 
 from account.models import Account
 from rest_framework import serializers
+from core.serializers.utils import TimedSerializerMixin
 
 
 class AuthorExpandedSerializer(FlexFieldsModelSerializer):
@@ -20,7 +21,7 @@ class AuthorExpandedSerializer(FlexFieldsModelSerializer):
         return data
 
 
-class CreateAccountSerializer(FlexFieldsModelSerializer):
+class CreateAccountSerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
     id = serializers.PrimaryKeyRelatedField(read_only=True)
 
@@ -33,7 +34,7 @@ class CreateAccountSerializer(FlexFieldsModelSerializer):
         fields = ['id', 'email', 'username', 'password', 'is_active']
 
 
-class CreateAccountPrivilegedSerializer(FlexFieldsModelSerializer):
+class CreateAccountPrivilegedSerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
     id = serializers.PrimaryKeyRelatedField(read_only=True)
 
@@ -46,20 +47,25 @@ class CreateAccountPrivilegedSerializer(FlexFieldsModelSerializer):
         fields = ['id', 'email', 'username', 'password', 'is_staff', 'is_active']
 
 
-class ReadAccountSerializer(FlexFieldsModelSerializer):
+class ReadAccountSerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     class Meta:
         model = Account
         fields = ['id', 'username',
                   'date_joined', 'last_login', 'is_admin', 'is_staff']
 
 
-class ReadAccountPrivilegedSerializer(FlexFieldsModelSerializer):
+class ReadAccountPrivilegedSerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     class Meta:
         model = Account
         fields = ['id', 'email', 'username',
                   'date_joined', 'last_login', 'is_admin', 'is_staff', 'is_active']
 
 
+class AccountSearchSerializer(serializers.Serializer):
+    prefix = serializers.CharField(max_length=60, trim_whitespace=True)
+    limit = serializers.IntegerField(min_value=1, max_value=50, required=False, default=10)
+
+
 class UserLoginSerializer(serializers.Serializer):
     email = serializers.EmailField(write_only=True, required=True)
     password = serializers.CharField(write_only=True, required=True)
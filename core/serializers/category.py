@@ -1,8 +1,9 @@
 from rest_flex_fields import FlexFieldsModelSerializer
 import core.models
+from core.serializers.utils import TimedSerializerMixin
 
 
-class PostCategorySerializer(FlexFieldsModelSerializer):
+class PostCategorySerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     class Meta:
         model = core.models.PostCategory
         fields = '__all__'
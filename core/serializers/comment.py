@@ -1,11 +1,13 @@
 import core.models
 
 from rest_flex_fields import FlexFieldsModelSerializer
+from rest_framework import serializers
 from core.serializers.account import AuthorExpandedSerializer
 from core.serializers.post import PostExpandedSerializer
+from core.serializers.utils import TimedSerializerMixin
 
 
-class CommentSerializer(FlexFieldsModelSerializer):
+class CommentSerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     class Meta:
         model = core.models.PostComment
         fields = '__all__'
@@ -15,7 +17,7 @@ class CommentSerializer(FlexFieldsModelSerializer):
             'author': AuthorExpandedSerializer}
 
 
-class CommentChangeSerializer(FlexFieldsModelSerializer):
+class CommentChangeSerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     class Meta:
         model = core.models.PostComment
         fields = '__all__'
@@ -25,3 +27,11 @@ class CommentChangeSerializer(FlexFieldsModelSerializer):
         expandable_fields = {
             'post': PostExpandedSerializer,
             'author': AuthorExpandedSerializer}
+
+
+class BulkCommentSerializer(serializers.ModelSerializer):
+    post = serializers.IntegerField(source='post_id', min_value=1)
+
+    class Meta:
+        model = core.models.PostComment
+        fields = ['post', 'content']
@@ -0,0 +1,22 @@
+import core.models
+
+from rest_framework import serializers
+
+from core.serializers.comment import CommentSerializer
+from core.serializers.post import PostSerializer
+
+FEED_COMMENTS_DEFAULT = 3
+FEED_COMMENTS_MAX = 20
+
+
+class FeedParamsSerializer(serializers.Serializer):
+    comments = serializers.IntegerField(min_value=0, max_value=FEED_COMMENTS_MAX, required=False,
+                                        default=FEED_COMMENTS_DEFAULT)
+
+
+class FeedPostSerializer(PostSerializer):
+    first_comments = CommentSerializer(many=True, read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        model = core.models.Post
+        fields = PostSerializer.Meta.fields + ['first_comments']
@@ -1,3 +1,5 @@
+import time
+
 import core.models
 
 from rest_flex_fields import FlexFieldsModelSerializer
@@ -6,21 +8,43 @@ from core.serializers.account import AuthorExpandedSerializer
 
 from core.serializers.category import PostCategorySerializer
 from core.models import Post
+from core import metrics
+from core.serializers.utils import TimedSerializerMixin, IsActiveSerializer
 
 
-class PostSerializer(FlexFieldsModelSerializer):
+class PostSerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     """Сериалайзер для чтения постов"""
     author = serializers.PrimaryKeyRelatedField(read_only=True)
     categories = serializers.PrimaryKeyRelatedField(queryset=core.models.PostCategory.objects.all(), many=True)
 
     class Meta:
         model = core.models.Post
-        fields = ['id', 'author', 'title', 'content', 'date', 'is_active', 'categories']
+        fields = ['id', 'author', 'title', 'content', 'date', 'is_active', 'categories',
+                  'likes_count', 'dislikes_count', 'comments_count']
+        extra_kwargs = {'likes_count': {'read_only': True},
+                        'dislikes_count': {'read_only': True},
+                        'comments_count': {'read_only': True}}
         expandable_fields = {'author': AuthorExpandedSerializer,
                              'categories': (PostCategorySerializer, {'many': True})
                              }
 
 
+class PostModerationSerializer(IsActiveSerializer):
+    author = serializers.IntegerField(min_value=1, required=False)
+    categories = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False)
+    title = serializers.CharField(required=False)
+
+    SCOPE_FIELDS = ('author', 'categories', 'date_from', 'date_to', 'title')
+
+    def validate(self, attrs):
+        if 'date_from' in attrs and 'date_to' in attrs and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'date_to': ['Must not be earlier than date_from.']})
+
+        return attrs
+
+
 class PostExpandedSerializer(FlexFieldsModelSerializer):
     """Сериалайзер для чтения постов"""
     author = serializers.PrimaryKeyRelatedField(read_only=True)
@@ -37,3 +61,81 @@ class PostExpandedSerializer(FlexFieldsModelSerializer):
     class Meta:
         model = core.models.Post
         fields = ['id', 'author', 'title', 'content', 'date', 'is_active', 'categories']
+        expandable_fields = {'author': AuthorExpandedSerializer,
+                             'categories': (PostCategorySerializer, {'many': True})
+                             }
+
+
+class PostListValuesSerializer:
+    """PostSerializer(many=True) output built from values() rows, without model instances"""
+
+    def __init__(self, queryset, context=None):
+        self.queryset = queryset
+        self.template = PostSerializer(context=context)
+
+    def get_field_names(self):
+        fields = self.template.fields
+        self.template.apply_flex_fields(fields, self.template._flex_options_rep_only)
+        return list(fields)
+
+    def get_plan(self):
+        # (field name, values() column, converter); categories are loaded separately
+        fields = self.template.fields
+        plan = []
+
+        for name in self.get_field_names():
+            if name == 'categories':
+                plan.append((name, None, None))
+            elif name == 'author':
+                plan.append((name, 'author_id', None))
+            else:
+                plan.append((name, name, fields[name].to_representation))
+
+        return plan
+
+    def get_rows_queryset(self, plan):
+        columns = [column for _, column, _ in plan if column is not None]
+        return self.queryset.prefetch_related(None).values('id', *columns)
+
+    def get_links_queryset(self, plan, post_ids):
+        if not any(name == 'categories' for name, _, _ in plan):
+            return Post.categories.through.objects.none()
+
+        return (Post.categories.through.objects
+                .filter(post_id__in=post_ids)
+                .order_by('postcategory_id')
+                .values_list('post_id', 'postcategory_id'))
+
+    def render(self, plan, rows, links):
+        request_metrics = metrics.get_request_metrics()
+        started = time.perf_counter()
+
+        categories = {row['id']: [] for row in rows}
+        for post_id, category_id in links:
+            categories[post_id].append(category_id)
+
+        data = []
+        for row in rows:
+            item = dict()
+
+            for name, column, to_representation in plan:
+                if column is None:
+                    item[name] = categories[row['id']]
+                else:
+                    value = row[column]
+                    item[name] = to_representation(value) if to_representation and value is not None else value
+
+            data.append(item)
+
+        if request_metrics is not None:
+            request_metrics.serializer_time += time.perf_counter() - started
+
+        return data
+
+    @property
+    def data(self):
+        plan = self.get_plan()
+        rows = list(self.get_rows_queryset(plan))
+        links = list(self.get_links_queryset(plan, [row['id'] for row in rows]))
+
+        return self.render(plan, rows, links)
@@ -5,9 +5,10 @@ from rest_framework import serializers
 
 from core.serializers.account import AuthorExpandedSerializer
 from core.serializers.post import PostExpandedSerializer
+from core.serializers.utils import TimedSerializerMixin
 
 
-class ReactionSerializer(FlexFieldsModelSerializer):
+class ReactionSerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     author = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
@@ -18,7 +19,7 @@ class ReactionSerializer(FlexFieldsModelSerializer):
             'author': AuthorExpandedSerializer}
 
 
-class ReactionChangeSerializer(FlexFieldsModelSerializer):
+class ReactionChangeSerializer(TimedSerializerMixin, FlexFieldsModelSerializer):
     class Meta:
         model = core.models.PostReaction
         fields = '__all__'
@@ -26,4 +27,12 @@ class ReactionChangeSerializer(FlexFieldsModelSerializer):
                         'post': {'read_only': True}}
         expandable_fields = {
             'post': PostExpandedSerializer,
-            'author': AuthorExpandedSerializer}
\ No newline at end of file
+            'author': AuthorExpandedSerializer}
+
+
+class BulkReactionSerializer(serializers.ModelSerializer):
+    post = serializers.IntegerField(source='post_id', min_value=1)
+
+    class Meta:
+        model = core.models.PostReaction
+        fields = ['post', 'reaction']
@@ -1,5 +1,27 @@
+import time
+
 from rest_framework import serializers
 
+from core import metrics
+
+
+class TimedSerializerMixin:
+    """Adds the serialization time of the response root to the request metrics"""
+
+    def _is_response_root(self):
+        return self.parent is None or (self.parent is self.root and isinstance(self.parent, serializers.ListSerializer))
+
+    def to_representation(self, instance):
+        request_metrics = metrics.get_request_metrics()
+        if request_metrics is None or not self._is_response_root():
+            return super().to_representation(instance)
+
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            request_metrics.serializer_time += time.perf_counter() - started
+
 
 class IsActiveSerializer(serializers.Serializer):
     is_active = serializers.BooleanField(required=True, allow_null=False)
@@ -8,3 +30,8 @@ class IsActiveSerializer(serializers.Serializer):
 class LimitOffsetSerializer(serializers.Serializer):
     limit = serializers.IntegerField(min_value=1, required=False)
     offset = serializers.IntegerField(min_value=0, required=False)
+
+
+class CursorSerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(min_value=1, required=False)
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from core import metrics, repository, search, versions
+from core.models import Preference, Limit, Post, PostCategory, PostComment, PostReaction
+
+UserModel = get_user_model()
+
+
+@receiver(connection_created)
+def install_metrics_sql_wrapper(sender, connection, **kwargs):
+    metrics.install_sql_wrapper(connection)
+
+
+@receiver([post_save, post_delete], sender=Preference)
+@receiver([post_save, post_delete], sender=Limit)
+def invalidate_preferences_cache(sender, **kwargs):
+    # Reloading before the commit would cache the old values again
+    transaction.on_commit(repository.invalidate_preferences)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, using, **kwargs):
+    search.index_post(instance, using=using)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, using, **kwargs):
+    search.unindex_post(instance.pk, using=using)
+
+
+@receiver(pre_save, sender=PostReaction)
+def remember_previous_reaction(sender, instance, using, **kwargs):
+    previous = None
+    if instance.pk is not None:
+        reactions = PostReaction.objects.using(using).filter(pk=instance.pk)
+        if transaction.get_connection(using).in_atomic_block:
+            reactions = reactions.select_for_update()
+        previous = reactions.values_list('post_id', 'reaction').first()
+
+    instance._previous_reaction = previous
+
+
+@receiver(post_save, sender=PostReaction)
+def count_saved_reaction(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_reaction', None)
+    if previous is not None and previous[0] != instance.post_id:
+        repository.change_reaction_counters(previous[0], removed=previous[1])
+        previous = None
+
+    repository.change_reaction_counters(instance.post_id, added=instance.reaction,
+                                        removed=previous[1] if previous else None)
+
+
+@receiver(post_delete, sender=PostReaction)
+def count_deleted_reaction(sender, instance, **kwargs):
+    repository.change_reaction_counters(instance.post_id, removed=instance.reaction)
+
+
+@receiver(post_save, sender=PostComment)
+def count_created_comment(sender, instance, created, **kwargs):
+    if created:
+        repository.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=PostComment)
+def count_deleted_comment(sender, instance, **kwargs):
+    repository.change_comments_count(instance.post_id, -1)
+
+
+@receiver([post_save, post_delete], sender=Preference)
+@receiver([post_save, post_delete], sender=Limit)
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=PostCategory)
+@receiver([post_save, post_delete], sender=PostComment)
+@receiver([post_save, post_delete], sender=PostReaction)
+@receiver([post_save, post_delete], sender=UserModel)
+def bump_model_version(sender, **kwargs):
+    versions.bump_model_version(sender)
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def bump_post_categories_version(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # core.category_index is keyed on the through table version
+        versions.bump_model_version(Post, sender)
@@ -1,3 +1,1196 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib
+import json
+import os
+import re
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qsl
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import (AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+                          override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from account.models import Account
+from core import db_router, permissions, repository, search, throttling, versions, warmup
+from core.api.utils import BulkCreateMixin
+from core.api.views import CommentViewSet
+from core.management.commands import benchmark_api
+from core.management.commands.import_blog import ImportState
+from core.metrics import registry
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import ImportJournal, Limit, Post, PostCategory, PostComment, PostReaction, Preference
+from core.serializers.category import PostCategorySerializer
+from core.serializers.post import PostSerializer
+from tblog import gunicorn_config
+from tblog.asgi import application
+
+# A file cache is shared by processes, so ETags and other version-based caching are enabled with it
+SHARED_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'tblog-test-cache'),
+    }
+}
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BlogTestCase(TestCase):
+
+    def setUp(self):
+        # Model versions live in the cache and must not leak between tests
+        cache.clear()
+
+        self.staff = Account.objects.create_user('staff@example.com', 'staff', 'password')
+        self.staff.is_staff = True
+        self.staff.save()
+        self.user = Account.objects.create_user('user@example.com', 'user', 'password')
+
+        self.categories = [PostCategory.objects.create(name=f'category{i}') for i in range(3)]
+        self.posts = []
+        for i in range(12):
+            post = Post.objects.create(author=self.staff, title=f'title {i}', content=f'content {i}',
+                                       is_active=i % 4 != 0)
+            post.categories.set(self.categories[:i % 3])
+            self.posts.append(post)
+
+        self.client = APIClient()
+        self.user_client = APIClient()
+        self.user_client.login(email='user@example.com', password='password')
+        self.staff_client = APIClient()
+        self.staff_client.login(email='staff@example.com', password='password')
+
+    def active_post(self):
+        return self.posts[1]
+
+
+class CursorPaginationTests(BlogTestCase):
+
+    def read_all_pages(self, client, path):
+        ids, cursor, pages = [], '', []
+
+        while cursor is not None:
+            data = client.get(path, {'cursor': cursor, 'limit': 5}).json()
+            ids += [row['id'] for row in data['results']]
+            pages.append(data)
+            cursor = data['next']
+
+        return ids, pages
+
+    def test_pages_follow_the_list_order(self):
+        ids, pages = self.read_all_pages(self.client, '/api/posts')
+
+        expected = list(Post.objects.filter(is_active=True).order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), 2)
+        self.assertIsNone(pages[0]['prev'])
+
+    def test_prev_cursor_returns_the_previous_page(self):
+        _, pages = self.read_all_pages(self.client, '/api/posts')
+
+        data = self.client.get('/api/posts', {'cursor': pages[-1]['prev'], 'limit': 5}).json()
+        self.assertEqual(data['results'], pages[0]['results'])
+
+    def test_staff_pages_include_inactive_posts(self):
+        ids, _ = self.read_all_pages(self.staff_client, '/api/posts')
+
+        self.assertEqual(sorted(ids), sorted(post.pk for post in self.posts))
+
+    def test_comment_pages_in_id_order(self):
+        comments = PostComment.objects.bulk_create(
+            [PostComment(post=self.active_post(), author=self.user, content=str(i)) for i in range(7)])
+
+        ids, pages = self.read_all_pages(self.client, '/api/comments')
+
+        self.assertEqual(ids, [comment.pk for comment in comments])
+        self.assertEqual(len(pages), 2)
+
+    def test_filters_apply_before_the_cursor(self):
+        post = self.active_post()
+        PostComment.objects.create(post=self.posts[2], author=self.user, content='other post')
+        PostComment.objects.create(post=post, author=self.user, content='this post')
+
+        data = self.client.get('/api/comments', {'cursor': '', 'post': post.pk}).json()
+
+        self.assertEqual([comment['content'] for comment in data['results']], ['this post'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/posts', {'cursor': 'broken'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ExpandQueryTests(BlogTestCase):
+
+    def count_queries(self, path, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+
+        return len(queries)
+
+    def add_comments_and_reactions(self, count):
+        for i in range(count):
+            author = Account.objects.create_user(f'reader{i}-{count}@example.com', f'reader{i}-{count}', 'password')
+            post = self.posts[1 + i % 3]
+            PostComment.objects.create(post=post, author=author, content=str(i))
+            PostReaction.objects.create(post=post, author=author, reaction='+')
+
+    def test_expanded_posts(self):
+        params = {'expand': 'author,categories'}
+
+        self.assertEqual(self.count_queries('/api/posts', {**params, 'limit': 2}),
+                         self.count_queries('/api/posts', {**params, 'limit': 10}))
+
+    def test_expanded_comments(self):
+        params = {'expand': 'author,post'}
+        self.add_comments_and_reactions(2)
+        few = self.count_queries('/api/comments', params)
+        self.add_comments_and_reactions(8)
+
+        self.assertEqual(self.count_queries('/api/comments', params), few)
+
+    def test_expanded_reactions(self):
+        params = {'expand': 'post.author,author'}
+        self.add_comments_and_reactions(2)
+        few = self.count_queries('/api/reactions', params)
+        self.add_comments_and_reactions(8)
+
+        self.assertEqual(self.count_queries('/api/reactions', params), few)
+
+
+class CounterTests(BlogTestCase):
+
+    def test_reaction_counters(self):
+        post = self.active_post()
+
+        reaction = self.user_client.post('/api/reactions', {'post': post.pk, 'reaction': '+'}, format='json').json()
+        self.staff_client.post('/api/reactions', {'post': post.pk, 'reaction': '-'}, format='json')
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.dislikes_count), (1, 1))
+
+        self.user_client.patch(f'/api/reactions/{reaction["id"]}', {'reaction': '-'}, format='json')
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.dislikes_count), (0, 2))
+
+        self.user_client.delete(f'/api/reactions/{reaction["id"]}')
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.dislikes_count), (0, 1))
+        self.assertEqual(self.client.get(f'/api/posts/{post.pk}').json()['dislikes_count'], 1)
+
+    def test_orm_changes_keep_counters(self):
+        post, other = self.active_post(), self.posts[2]
+        reaction = PostReaction.objects.create(post=post, author=self.user, reaction='+')
+        comment = PostComment.objects.create(post=post, author=self.user, content='comment')
+        PostComment.objects.create(post=post, author=self.staff, content='comment')
+
+        reaction.reaction = '-'
+        reaction.save()
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.dislikes_count, post.comments_count), (0, 1, 2))
+
+        reaction.post = other
+        reaction.save()
+        comment.delete()
+        post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((post.dislikes_count, post.comments_count, other.dislikes_count), (0, 1, 1))
+
+        PostReaction.objects.filter(pk=reaction.pk).delete()
+        other.refresh_from_db()
+        self.assertEqual(other.dislikes_count, 0)
+
+    def test_rebuild_reaction_counters(self):
+        post = self.active_post()
+        PostReaction.objects.create(post=post, author=self.user, reaction='+')
+        PostReaction.objects.create(post=post, author=self.staff, reaction='+')
+        Post.objects.filter(pk=post.pk).update(likes_count=0, dislikes_count=5)
+
+        call_command('rebuild_reaction_counters', post.pk, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.dislikes_count), (2, 0))
+
+
+class PreferenceCacheTests(TestCase):
+
+    def setUp(self):
+        repository.invalidate_preferences()
+        self.preference = Preference.objects.create(name='title', value='blog')
+        self.limit = Limit.objects.create(name='number_of_posts_to_show', value=10)
+
+    def test_repeated_lookups_hit_the_cache(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(repository.get_preferences_unlazy(['title', 'missing']), ['blog'])
+            self.assertEqual(repository.get_limit('number_of_posts_to_show'), 10)
+            self.assertEqual(repository.get_limit('number_of_posts_to_show'), 10)
+
+        with self.assertRaises(Limit.DoesNotExist):
+            repository.get_limit('missing')
+
+    def test_save_invalidates_on_commit(self):
+        repository.get_limit('number_of_posts_to_show')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.limit.value = 20
+            self.limit.save()
+            self.assertEqual(repository.get_limit('number_of_posts_to_show'), 10)
+
+        self.assertEqual(repository.get_limit('number_of_posts_to_show'), 20)
+
+    def test_delete_invalidates(self):
+        repository.get_preferences_unlazy(['title'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.preference.delete()
+
+        self.assertEqual(repository.get_preferences_unlazy(['title']), [])
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_change_in_another_worker_is_seen_through_versions(self):
+        cache.clear()
+        repository.get_limit('number_of_posts_to_show')
+        # Another worker saves the limit: only the shared model version changes here
+        with self.captureOnCommitCallbacks(execute=True):
+            Limit.objects.filter(pk=self.limit.pk).update(value=30)
+            versions.bump_model_version(Limit)
+
+        self.assertEqual(repository.get_limit('number_of_posts_to_show'), 30)
+
+
+class SearchTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.title_match = Post.objects.create(author=self.staff, title='Django cache', content='tuning notes')
+        self.content_match = Post.objects.create(author=self.staff, title='Notes',
+                                                 content='about the django cache and more')
+
+    def search(self, query):
+        response = self.client.get('/api/posts', {'q': query})
+        self.assertEqual(response.status_code, 200)
+
+        return [post['id'] for post in response.json()]
+
+    def test_all_words_match_and_title_ranks_first(self):
+        self.assertEqual(self.search('django cache'), [self.title_match.pk, self.content_match.pk])
+        self.assertEqual(self.search('tuning'), [self.title_match.pk])
+        self.assertEqual(self.search('django missing'), [])
+
+    def test_update_is_reindexed(self):
+        self.staff_client.patch(f'/api/posts/{self.content_match.pk}', {'title': 'Postgres vacuum'}, format='json')
+
+        self.assertEqual(self.search('vacuum'), [self.content_match.pk])
+
+    def test_bulk_create_needs_rebuild(self):
+        post, = Post.objects.bulk_create([Post(author=self.staff, title='Bulk', content='imported')])
+        search.rebuild_index()
+
+        self.assertEqual(self.search('imported'), [post.pk])
+
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(self.search('"'), [])
+        self.assertEqual(self.search('django" OR "x'), [])
+
+
+class BulkCreateTests(BlogTestCase):
+
+    def test_all_items_created(self):
+        post = self.active_post()
+        response = self.user_client.post('/api/comments', [{'post': post.pk, 'content': 'first'},
+                                                           {'post': post.pk, 'content': 'second'}], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(PostComment.objects.filter(post=post, author=self.user).count(), 2)
+
+    def test_partial_success_is_multi_status(self):
+        post = self.active_post()
+        response = self.user_client.post('/api/comments', [{'post': post.pk, 'content': 'valid'},
+                                                           {'post': 999999, 'content': 'missing post'},
+                                                           {'post': post.pk}], format='json')
+
+        data = response.json()
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((data['created'], data['failed']), (1, 2))
+        self.assertEqual([result['status'] for result in data['results']], [201, 400, 400])
+        self.assertEqual(PostComment.objects.count(), 1)
+
+    def test_duplicate_reactions_fail_and_counters_follow(self):
+        post = self.active_post()
+        response = self.user_client.post('/api/reactions', [{'post': post.pk, 'reaction': '+'},
+                                                            {'post': post.pk, 'reaction': '-'}], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.json()['results']], [201, 400])
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.dislikes_count), (1, 0))
+
+    def test_nothing_created(self):
+        response = self.user_client.post('/api/comments', [{'post': 999999, 'content': 'missing post'}],
+                                         format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_default_perform_bulk_create(self):
+        class CategoryBulkCreate(BulkCreateMixin):
+            bulk_serializer_class = PostCategorySerializer
+
+        version = versions.get_model_versions([PostCategory])[PostCategory]
+        with self.captureOnCommitCallbacks(execute=True):
+            created = CategoryBulkCreate().perform_bulk_create([{'name': 'first'}, {'name': 'second'}])
+
+        self.assertEqual([category.name for category in created], ['first', 'second'])
+        self.assertEqual(PostCategory.objects.filter(name__in=['first', 'second']).count(), 2)
+        self.assertNotEqual(versions.get_model_versions([PostCategory])[PostCategory], version)
+
+
+class ConditionalGetTests(BlogTestCase):
+
+    def test_no_etag_with_process_cache(self):
+        response = self.client.get('/api/posts')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_not_modified_until_write(self):
+        cache.clear()
+        post = self.active_post()
+        etag = self.client.get(f'/api/posts/{post.pk}')['ETag']
+
+        self.assertEqual(self.client.get(f'/api/posts/{post.pk}', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.staff_client.patch(f'/api/posts/{post.pk}', {'title': 'changed'}, format='json')
+
+        response = self.client.get(f'/api/posts/{post.pk}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_etag_depends_on_user_class(self):
+        cache.clear()
+
+        self.assertNotEqual(self.client.get('/api/posts')['ETag'], self.staff_client.get('/api/posts')['ETag'])
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_related_model_change_updates_etag(self):
+        cache.clear()
+        post = self.active_post()
+        etag = self.client.get('/api/posts')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_client.post('/api/reactions', {'post': post.pk, 'reaction': '+'}, format='json')
+
+        self.assertEqual(self.client.get('/api/posts', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_last_modified_is_rounded_up(self):
+        cache.clear()
+        post = self.active_post()
+        with mock.patch('core.versions._new_version', return_value=('old', 1_000_000.25)):
+            response = self.client.get(f'/api/posts/{post.pk}')
+
+        self.assertEqual(response['Last-Modified'], http_date(1_000_001))
+        response = self.client.get(f'/api/posts/{post.pk}', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(f'/api/posts/{post.pk}', HTTP_IF_MODIFIED_SINCE=http_date(1_000_000))
+                         .status_code, 200)
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_if_none_match_takes_precedence(self):
+        cache.clear()
+        post = self.active_post()
+        with mock.patch('core.versions._new_version', return_value=('old', 1_000_000.25)):
+            last_modified = self.client.get(f'/api/posts/{post.pk}')['Last-Modified']
+
+        response = self.client.get(f'/api/posts/{post.pk}', HTTP_IF_MODIFIED_SINCE=last_modified,
+                                   HTTP_IF_NONE_MATCH='W/"other"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_no_last_modified_within_the_change_second(self):
+        cache.clear()
+        with mock.patch('core.versions._new_version', return_value=('new', time.time() + 60)):
+            response = self.client.get(f'/api/posts/{self.active_post().pk}')
+
+        self.assertTrue(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class ResponseCacheTests(BlogTestCase):
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_write_invalidates_cached_response(self):
+        cache.clear()
+        post = self.active_post()
+        self.client.get(f'/api/posts/{post.pk}')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(f'/api/posts/{post.pk}').json()['title'], post.title)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.staff_client.patch(f'/api/posts/{post.pk}', {'title': 'changed'}, format='json')
+
+        self.assertEqual(self.client.get(f'/api/posts/{post.pk}').json()['title'], 'changed')
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_cache_is_per_user_class(self):
+        cache.clear()
+        self.client.get('/api/posts')
+
+        self.assertEqual(len(self.staff_client.get('/api/posts').json()), len(self.posts))
+
+    def test_process_cache_is_not_used_for_responses(self):
+        post = self.active_post()
+        self.client.get(f'/api/posts/{post.pk}')
+        Post.objects.filter(pk=post.pk).update(title='changed')
+
+        self.assertEqual(self.client.get(f'/api/posts/{post.pk}').json()['title'], 'changed')
+
+
+class QueryPlanTests(BlogTestCase):
+
+    def test_main_queries_use_indexes(self):
+        output = StringIO()
+        call_command('check_query_plans', stdout=output)
+
+        self.assertIn('All checked queries use indexes', output.getvalue())
+
+
+class SeedAndBenchmarkTests(TestCase):
+
+    def test_seed_blog(self):
+        call_command('seed_blog', accounts=5, categories=3, posts=20, comments=30, reactions=40, stdout=StringIO())
+
+        self.assertEqual((Account.objects.count(), Post.objects.count(), PostComment.objects.count(),
+                          PostReaction.objects.count()), (5, 20, 30, 40))
+        post = Post.objects.filter(postreaction__reaction='+').first()
+        self.assertEqual(post.likes_count, post.postreaction_set.filter(reaction='+').count())
+
+    def test_benchmark_endpoints_respond(self):
+        call_command('seed_blog', accounts=5, categories=3, posts=20, comments=30, reactions=40, stdout=StringIO())
+        command = benchmark_api.Command(stdout=StringIO())
+
+        results = command.run_benchmark({'iterations': 2, 'only': ['post detail', 'reaction create'],
+                                         'cold_cache': False})
+
+        self.assertEqual({name: result['status'] for name, result in results.items()},
+                         {'post detail': 200, 'post detail expanded': 200, 'reaction create': 201})
+
+    def test_benchmark_runs_more_iterations_than_posts(self):
+        call_command('seed_blog', accounts=5, categories=3, posts=3, comments=5, reactions=0, stdout=StringIO())
+        command = benchmark_api.Command(stdout=StringIO())
+
+        results = command.run_benchmark({'iterations': 5, 'only': ['reaction create'], 'cold_cache': False})
+
+        self.assertEqual(list(results), ['reaction create'])
+
+
+class MetricsTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_server_timing(self):
+        response = self.client.get(f'/api/posts/{self.active_post().pk}')
+
+        timings = {part.split(';')[0]: part for part in response['Server-Timing'].split(', ')}
+        self.assertEqual(set(timings), {'sql', 'serializer', 'view', 'total', 'response'})
+        self.assertRegex(timings['sql'], r'desc="[1-9]\d* queries"')
+        self.assertEqual(timings['response'], f'response;desc="{len(response.content)} bytes"')
+
+    def test_metrics_are_staff_only(self):
+        self.client.get('/api/posts')
+
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+        self.assertEqual(self.user_client.get('/api/metrics').status_code, 403)
+
+        response = self.staff_client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('tblog_http_request_duration_seconds_count{method="GET",route="api/posts/?$"} 1',
+                      response.content.decode())
+
+
+class PostListSerializationTests(BlogTestCase):
+
+    def render_expected(self, **kwargs):
+        queryset = Post.objects.filter(is_active=True).order_by('-date')
+        return JSONRenderer().render(PostSerializer(queryset, many=True, **kwargs).data)
+
+    def test_list_matches_post_serializer(self):
+        response = self.client.get('/api/posts')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(JSONRenderer().render(response.json()), self.render_expected())
+
+    def test_fields_and_omit_match_post_serializer(self):
+        response = self.client.get('/api/posts', {'fields': 'id,title,categories'})
+        self.assertEqual(JSONRenderer().render(response.json()),
+                         self.render_expected(fields=['id', 'title', 'categories']))
+
+        response = self.client.get('/api/posts', {'omit': 'content,categories'})
+        self.assertEqual(JSONRenderer().render(response.json()),
+                         self.render_expected(omit=['content', 'categories']))
+
+    def test_expand_uses_model_serializer(self):
+        response = self.client.get('/api/posts', {'expand': 'author', 'limit': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['author']['username'], 'staff')
+
+
+class ExportTests(BlogTestCase):
+
+    def read_export(self, response):
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_all_filtered_rows_in_id_order(self):
+        rows = self.read_export(self.staff_client.get('/api/posts', {'export': 'ndjson', 'limit': 2}))
+
+        self.assertEqual([row['id'] for row in rows], sorted(post.pk for post in self.posts))
+        self.assertEqual(rows[2]['categories'], [category.pk for category in self.categories[:2]])
+        self.assertEqual(rows[2]['author'], self.staff.pk)
+
+        rows = self.read_export(self.staff_client.get('/api/posts', {'export': 'ndjson', 'is_active': False}))
+        self.assertEqual(len(rows), 3)
+
+    def test_gzip(self):
+        PostReaction.objects.create(post=self.active_post(), author=self.user, reaction='+')
+
+        response = self.staff_client.get('/api/reactions', {'export': 'ndjson'}, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(self.read_export(response),
+                         [{'id': PostReaction.objects.get().pk, 'author': self.user.pk,
+                           'post': self.active_post().pk, 'reaction': '+'}])
+
+    def test_only_staff_export(self):
+        self.assertEqual(self.client.get('/api/comments', {'export': 'ndjson'}).status_code, 403)
+        self.assertEqual(self.user_client.get('/api/posts', {'export': 'ndjson'}).status_code, 403)
+
+
+class ImportTests(TransactionTestCase):
+    # Journal entries are applied on commit of each batch, so batches have to commit for real
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.options = {'state': 'test-import', 'batch_size': 1, 'stdout': StringIO()}
+
+        self.files = {
+            'accounts': self.write('accounts.ndjson', [
+                {'id': 7, 'email': 'author@example.com', 'username': 'author'},
+                {'id': 8, 'email': 'reader@example.com', 'username': 'reader'}]),
+            'categories': self.write('categories.ndjson', [{'id': 3, 'name': 'news'}]),
+            'posts': self.write('posts.ndjson', [
+                {'id': 1, 'author': 7, 'title': 'first', 'content': 'text', 'categories': [3],
+                 'date': '2020-01-01T10:00:00+00:00'},
+                {'id': 2, 'author': 7, 'title': 'second', 'content': 'text', 'categories': [],
+                 'date': 'broken'}]),
+            'comments': self.write('comments.ndjson', [{'id': 1, 'author': 8, 'post': 1, 'content': 'comment'},
+                                                       {'id': 2, 'author': 99, 'post': 1, 'content': 'skipped'}]),
+            'reactions': self.write('reactions.ndjson', [{'author': 8, 'post': 1, 'reaction': '+'},
+                                                         {'author': 7, 'post': 1, 'reaction': '+'}]),
+        }
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, name, rows):
+        with open(self.path(name), 'w') as file:
+            file.writelines(json.dumps(row) + '\n' for row in rows)
+
+        return self.path(name)
+
+    def test_failed_batch_resumes(self):
+        with self.assertRaisesMessage(CommandError, 'posts: rows 2-2 failed'):
+            call_command('import_blog', **self.files, **self.options)
+        self.assertEqual(Post.objects.count(), 1)
+
+        self.write('posts.ndjson', [
+            {'id': 1, 'author': 7, 'title': 'first', 'content': 'text', 'categories': [3],
+             'date': '2020-01-01T10:00:00+00:00'},
+            {'id': 2, 'author': 7, 'title': 'second', 'content': 'text', 'categories': [],
+             'date': '2020-01-02T10:00:00+00:00'}])
+        call_command('import_blog', **self.files, **self.options)
+
+        self.assertEqual(Account.objects.count(), 2)
+        self.assertEqual(list(Post.objects.order_by('date').values_list('title', flat=True)), ['first', 'second'])
+        post = Post.objects.get(title='first')
+        self.assertEqual(post.date.year, 2020)
+        self.assertEqual(list(post.categories.values_list('name', flat=True)), ['news'])
+        self.assertEqual(list(PostComment.objects.values_list('content', flat=True)), ['comment'])
+        self.assertEqual(post.likes_count, 2)
+        self.assertFalse(ImportJournal.objects.exists())
+
+    def test_crash_inside_a_batch_resumes_without_duplicates(self):
+        save = ImportState.save
+
+        def crash_on_second_reaction(state, step, done, *args):
+            if step == 'reactions' and done == 2:
+                raise RuntimeError('worker killed')
+            return save(state, step, done, *args)
+
+        self.write('posts.ndjson', [{'id': 1, 'author': 7, 'title': 'first', 'content': 'text'}])
+        with mock.patch.object(ImportState, 'save', crash_on_second_reaction):
+            with self.assertRaises(RuntimeError):
+                call_command('import_blog', **self.files, **self.options)
+        self.assertEqual(PostReaction.objects.count(), 1)
+
+        call_command('import_blog', **self.files, **self.options)
+
+        self.assertEqual((Post.objects.count(), PostComment.objects.count(), PostReaction.objects.count()), (1, 1, 2))
+        self.assertEqual(Post.objects.get().likes_count, 2)
+
+    def test_existing_rows_are_matched(self):
+        Account.objects.create_user('author@example.com', 'existing', 'password')
+        self.write('posts.ndjson', [{'id': 1, 'author': 7, 'title': 'first', 'content': 'text'}])
+
+        call_command('import_blog', accounts=self.files['accounts'], posts=self.files['posts'], **self.options)
+
+        self.assertEqual(Account.objects.count(), 2)
+        self.assertEqual(Post.objects.get().author.username, 'existing')
+
+
+class ModerationTests(BlogTestCase):
+
+    def moderate(self, client, data):
+        return client.patch('/api/posts', data, format='json')
+
+    def test_filters_scope_the_update(self):
+        category = self.categories[1]
+        expected = Post.objects.filter(categories=category, is_active=True).count()
+
+        response = self.moderate(self.staff_client, {'is_active': False, 'categories': [category.pk]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'count': expected})
+        self.assertFalse(Post.objects.filter(categories=category, is_active=True).exists())
+        self.assertEqual(self.moderate(self.staff_client, {'is_active': False, 'categories': [category.pk]})
+                         .json(), {'count': 0})
+
+    def test_own_posts_without_filters(self):
+        inactive = Post.objects.filter(is_active=False).count()
+        response = self.moderate(self.staff_client, {'is_active': True})
+
+        self.assertEqual(response.json(), {'count': inactive})
+        self.assertFalse(Post.objects.filter(is_active=False).exists())
+
+    def test_update_in_chunks(self):
+        posts = Post.objects.filter(is_active=True)
+        count = posts.count()
+
+        self.assertEqual(repository.update_in_chunks(posts, chunk_size=2, is_active=False), count)
+        self.assertFalse(Post.objects.filter(is_active=True).exists())
+
+    def test_regular_users_are_forbidden(self):
+        self.assertEqual(self.moderate(self.user_client, {'is_active': False}).status_code, 403)
+
+
+class AsyncReadTests(TransactionTestCase):
+    # The ASGI handler runs each request's database work in its own thread, so the data has to be committed
+
+    def setUp(self):
+        cache.clear()
+
+        self.staff = Account.objects.create_user('staff@example.com', 'staff', 'password')
+        self.category = PostCategory.objects.create(name='news')
+        self.post = Post.objects.create(author=self.staff, title='title', content='content')
+        self.post.categories.set([self.category])
+        Post.objects.create(author=self.staff, title='hidden', content='content', is_active=False)
+        PostComment.objects.create(post=self.post, author=self.staff, content='comment')
+
+    def asgi_get(self, path, query=''):
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                 'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                 'root_path': '', 'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 1),
+                 'server': ('testserver', 80)}
+
+        async def request():
+            communicator = ApplicationCommunicator(application, scope)
+            await communicator.send_input({'type': 'http.request', 'body': b''})
+            start = await communicator.receive_output()
+            body = b''
+            while True:
+                message = await communicator.receive_output()
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    return start['status'], body
+
+        return async_to_sync(request)()
+
+    def test_asgi_application_matches_sync_responses(self):
+        for path, query in (('/api/posts', 'limit=5'), (f'/api/posts/{self.post.pk}', ''), ('/api/categories', ''),
+                            ('/api/comments', f'post={self.post.pk}'), ('/api/posts/999999', '')):
+            status, body = self.asgi_get(path, query)
+            cache.clear()
+            sync_response = self.client.get(path, dict(parse_qsl(query)))
+
+            self.assertEqual(status, sync_response.status_code, path)
+            self.assertEqual(json.loads(body), sync_response.json(), path)
+
+    @override_settings(ROOT_URLCONF='core.async_urls')
+    async def test_reads_resolve_to_coroutines(self):
+        client = AsyncClient()
+
+        response = await client.get(f'/api/posts/{self.post.pk}')
+        self.assertTrue(asyncio.iscoroutinefunction(response.resolver_match.func))
+        self.assertEqual(response.json()['title'], 'title')
+
+        # ?expand= is passed to the synchronous viewset
+        response = await client.get(f'/api/posts/{self.post.pk}', {'expand': 'author'})
+        self.assertEqual(response.json()['author']['username'], 'staff')
+
+    @override_settings(ROOT_URLCONF='core.async_urls', CACHES=SHARED_CACHE)
+    async def test_conditional_headers(self):
+        await sync_to_async(cache.clear)()
+        client = AsyncClient()
+        with mock.patch('core.versions._new_version', return_value=('old', 1_000_000.25)):
+            response = await client.get(f'/api/posts/{self.post.pk}')
+
+        self.assertEqual(response['Last-Modified'], http_date(1_000_001))
+        # AsyncClient passes extra arguments as headers, without the HTTP_ prefix
+        response = await client.get(f'/api/posts/{self.post.pk}', IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        response = await client.get(f'/api/posts/{self.post.pk}', IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class FeedTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.comments = PostComment.objects.bulk_create(
+            [PostComment(post=post, author=self.user, content=f'{post.pk} {i}')
+             for post in self.posts for i in range(post.pk % 4)])
+        repository.rebuild_comments_count()
+
+    def feed(self, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/posts/feed', params)
+        self.assertEqual(response.status_code, 200)
+
+        return response.json(), len(queries)
+
+    def test_first_comments_and_counts(self):
+        posts, _ = self.feed(comments=2)
+
+        self.assertEqual([post['id'] for post in posts],
+                         list(Post.objects.filter(is_active=True).values_list('id', flat=True)))
+        for post in posts:
+            comment_ids = [comment.pk for comment in self.comments if comment.post_id == post['id']]
+            self.assertEqual(post['comments_count'], len(comment_ids))
+            self.assertEqual([comment['id'] for comment in post['first_comments']], comment_ids[:2])
+
+    def test_queries_do_not_depend_on_page_size(self):
+        _, few = self.feed(limit=2)
+        _, many = self.feed(limit=9)
+
+        self.assertEqual(few, many)
+
+    def test_cursor_pages(self):
+        first = self.client.get('/api/posts/feed', {'cursor': '', 'limit': 5}).json()
+        second = self.client.get('/api/posts/feed', {'cursor': first['next'], 'limit': 5}).json()
+
+        self.assertEqual(len(first['results']) + len(second['results']), 9)
+        self.assertIn('first_comments', second['results'][0])
+
+    def test_comments_param_is_validated(self):
+        self.assertEqual(self.client.get('/api/posts/feed', {'comments': 21}).status_code, 400)
+
+
+class CategoryFilterTests(BlogTestCase):
+
+    def filtered_ids(self, **params):
+        response = self.staff_client.get('/api/posts', {'limit': 100, **params})
+        self.assertEqual(response.status_code, 200)
+
+        return sorted(post['id'] for post in response.json())
+
+    def expected_ids(self, test):
+        return sorted(post.pk for post in self.posts if test({category.name for category in post.categories.all()}))
+
+    def check_filters(self):
+        first, second, unused = (category.name for category in self.categories)
+
+        self.assertEqual(self.filtered_ids(categories__in=f'{second},{unused}'),
+                         self.expected_ids(lambda names: second in names))
+        self.assertEqual(self.filtered_ids(categories__all=f'{first},{second}'),
+                         self.expected_ids(lambda names: {first, second} <= names))
+        self.assertEqual(self.filtered_ids(categories__all=f'{first},missing'), [])
+        self.assertEqual(self.filtered_ids(categories__not=second),
+                         self.expected_ids(lambda names: second not in names))
+        self.assertEqual(self.filtered_ids(categories__in=first, categories__not=second),
+                         self.expected_ids(lambda names: first in names and second not in names))
+        self.assertEqual(self.filtered_ids(categories__all=unused), [])
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_bitmap_path(self):
+        cache.clear()
+        self.check_filters()
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_large_selections_use_exists(self):
+        cache.clear()
+        with mock.patch('core.category_index.CATEGORY_INDEX_MAX_IDS', 0):
+            self.check_filters()
+
+    def test_process_cache_uses_exists(self):
+        with mock.patch('core.category_index.get_category_bitmaps') as get_category_bitmaps:
+            self.check_filters()
+
+        get_category_bitmaps.assert_not_called()
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_category_change_rebuilds_bitmaps(self):
+        cache.clear()
+        unused = self.categories[2]
+        self.filtered_ids(categories__in=unused.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[1].categories.add(unused)
+
+        self.assertEqual(self.filtered_ids(categories__in=unused.name), [self.posts[1].pk])
+
+
+class ThrottleTests(BlogTestCase):
+
+    def test_limit_and_retry_after(self):
+        post = self.active_post()
+        responses = [self.user_client.post('/api/comments', {'post': post.pk, 'content': str(i)}, format='json')
+                     for i in range(21)]
+
+        self.assertTrue(all(response.status_code == 201 for response in responses[:20]))
+        self.assertEqual(responses[20].status_code, 429)
+        self.assertGreater(int(responses[20]['Retry-After']), 0)
+
+    def test_limit_is_per_user(self):
+        post = self.active_post()
+        for i in range(20):
+            self.user_client.post('/api/comments', {'post': post.pk, 'content': str(i)}, format='json')
+
+        response = self.staff_client.post('/api/comments', {'post': post.pk, 'content': 'staff'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_login_is_limited_by_ip(self):
+        for _ in range(10):
+            self.client.get('/api/accounts/login', {'email': 'user@example.com', 'password': 'wrong'})
+
+        response = self.user_client.get('/api/accounts/login', {'email': 'user@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 429)
+
+    def test_rotating_forwarded_for_does_not_reset_limit(self):
+        # The proxy appends the real client address after whatever the client sent
+        responses = [self.client.get('/api/accounts/login', {'email': 'user@example.com', 'password': 'wrong'},
+                                     HTTP_X_FORWARDED_FOR=f'10.0.0.{i}, 192.0.2.1')
+                     for i in range(11)]
+        self.assertEqual(responses[10].status_code, 429)
+
+        response = self.client.get('/api/accounts/login', {'email': 'user@example.com', 'password': 'wrong'},
+                                   HTTP_X_FORWARDED_FOR='10.0.0.1, 192.0.2.2')
+        self.assertNotEqual(response.status_code, 429)
+
+    def test_reads_are_not_limited(self):
+        for _ in range(25):
+            self.assertEqual(self.user_client.get('/api/comments').status_code, 200)
+
+    def test_bulk_items_are_charged(self):
+        post = self.active_post()
+        items = [{'post': post.pk, 'content': str(i)} for i in range(15)]
+
+        self.assertEqual(self.user_client.post('/api/comments', items, format='json').status_code, 201)
+        self.assertEqual(self.user_client.post('/api/comments', items[:10], format='json').status_code, 429)
+        self.assertEqual(self.user_client.post('/api/comments', items[:5], format='json').status_code, 201)
+
+    def test_bulk_larger_than_limit(self):
+        post = self.active_post()
+        items = [{'post': post.pk, 'content': str(i)} for i in range(21)]
+
+        self.assertEqual(self.user_client.post('/api/comments', items, format='json').status_code, 429)
+        self.assertEqual(PostComment.objects.count(), 0)
+
+
+@override_settings(REPLICA_DATABASES=['replica_1'])
+@mock.patch('core.db_router.is_replica_healthy', return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = db_router.PrimaryReplicaRouter()
+
+    def route(self, method='get', cookies=None, write=False):
+        request = getattr(RequestFactory(), method)('/api/posts')
+        request.COOKIES.update(cookies or {})
+        reads = []
+
+        def get_response(request):
+            reads.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+                reads.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        return reads, ReplicaRoutingMiddleware(get_response)(request)
+
+    def test_safe_requests_read_from_replica(self, healthy):
+        reads, response = self.route()
+
+        self.assertEqual(reads, ['replica_1'])
+        self.assertNotIn(db_router.PRIMARY_DB_COOKIE, response.cookies)
+
+    def test_write_switches_to_primary_and_sets_cookie(self, healthy):
+        reads, response = self.route(write=True)
+
+        self.assertEqual(reads, ['replica_1', 'default'])
+        self.assertIn(db_router.PRIMARY_DB_COOKIE, response.cookies)
+        self.assertIn(db_router.PRIMARY_DB_COOKIE, self.route('post')[1].cookies)
+
+    def test_sticky_cookie_reads_from_primary(self, healthy):
+        reads, _ = self.route(cookies={db_router.PRIMARY_DB_COOKIE: '1'})
+
+        self.assertEqual(reads, ['default'])
+
+    def test_unhealthy_replica_and_pinned_requests(self, healthy):
+        healthy.return_value = False
+        self.assertEqual(self.route()[0], ['default'])
+
+        healthy.return_value = True
+        state, token = db_router.start_request(True)
+        try:
+            db_router.pin_primary()
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        finally:
+            db_router.finish_request(token)
+
+    def test_reads_outside_requests_use_primary(self, healthy):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+
+class WarmUpTests(TestCase):
+
+    def setUp(self):
+        repository.invalidate_preferences()
+
+    @mock.patch('core.warmup.connections')
+    def test_warm_up_loads_preferences(self, connections):
+        Preference.objects.create(name='title', value='blog')
+
+        warmup.warm_up()
+
+        connections.close_all.assert_called_once()
+        with self.assertNumQueries(0):
+            self.assertEqual(repository.get_preferences_unlazy(['title']), ['blog'])
+
+    @mock.patch('core.warmup.connections')
+    @mock.patch('core.repository.load_preferences', side_effect=DatabaseError('no database'))
+    def test_warm_up_without_database(self, load_preferences, connections):
+        with self.assertLogs('core.warmup', 'WARNING'):
+            warmup.warm_up()
+
+        connections.close_all.assert_called_once()
+
+    @mock.patch('core.warmup.warm_up')
+    def test_gunicorn_hooks(self, warm_up):
+        server = mock.Mock()
+        server.cfg.preload_app = True
+        server.cfg.workers = 1
+
+        gunicorn_config.when_ready(server)
+        gunicorn_config.post_worker_init(server)
+        self.assertEqual(warm_up.call_count, 1)
+
+        server.cfg.preload_app = False
+        gunicorn_config.when_ready(server)
+        gunicorn_config.post_worker_init(server)
+        self.assertEqual(warm_up.call_count, 2)
+
+    def test_gunicorn_threads_follow_cpu_count(self):
+        self.addCleanup(importlib.reload, gunicorn_config)
+        with mock.patch('multiprocessing.cpu_count', return_value=8), \
+                mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '2'}):
+            importlib.reload(gunicorn_config)
+        self.assertEqual((gunicorn_config.workers, gunicorn_config.threads), (2, 8))
+
+        with mock.patch('multiprocessing.cpu_count', return_value=8), \
+                mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '2', 'GUNICORN_THREADS': '4'}):
+            importlib.reload(gunicorn_config)
+        self.assertEqual(gunicorn_config.threads, 4)
+
+    @mock.patch('core.warmup.warm_up')
+    def test_gunicorn_warns_about_local_cache(self, warm_up):
+        server = mock.Mock()
+        server.cfg.preload_app = True
+        server.cfg.workers = 4
+
+        gunicorn_config.when_ready(server)
+        server.log.warning.assert_called_once()
+
+        server.log.reset_mock()
+        with override_settings(CACHES=SHARED_CACHE):
+            gunicorn_config.when_ready(server)
+        server.log.warning.assert_not_called()
+
+
+class PostCommentsTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.active_post()
+        self.comments = PostComment.objects.bulk_create(
+            [PostComment(post=self.post, author=self.user, content=str(i)) for i in range(7)])
+        PostComment.objects.create(post=self.posts[2], author=self.user, content='other post')
+        repository.rebuild_comments_count()
+
+    def test_only_the_comments_route_is_registered(self):
+        self.assertEqual(reverse('post-comments', kwargs={'id': self.post.pk}), f'/api/posts/{self.post.pk}/comments')
+        with self.assertRaises(NoReverseMatch):
+            reverse('post-comments-list')
+        with self.assertRaises(NoReverseMatch):
+            reverse('post-comments-detail', kwargs={'id': self.post.pk})
+
+    def test_pages_in_id_order(self):
+        path = f'/api/posts/{self.post.pk}/comments'
+        data = self.client.get(path, {'limit': 3}).json()
+        ids = [comment['id'] for comment in data['results']]
+
+        while data['next']:
+            data = self.client.get(path, {'limit': 3, 'cursor': data['next']}).json()
+            ids += [comment['id'] for comment in data['results']]
+            self.assertEqual(data['count'], 7)
+
+        self.assertEqual(ids, [comment.pk for comment in self.comments])
+
+    def test_prev_page(self):
+        path = f'/api/posts/{self.post.pk}/comments'
+        first = self.client.get(path, {'limit': 3}).json()
+        second = self.client.get(path, {'limit': 3, 'cursor': first['next']}).json()
+
+        self.assertEqual(self.client.get(path, {'limit': 3, 'cursor': second['prev']}).json()['results'],
+                         first['results'])
+
+    def test_inactive_and_missing_posts(self):
+        inactive = self.posts[0]
+
+        self.assertEqual(self.client.get(f'/api/posts/{inactive.pk}/comments').status_code, 404)
+        self.assertEqual(self.staff_client.get(f'/api/posts/{inactive.pk}/comments').status_code, 200)
+        self.assertEqual(self.client.get('/api/posts/999999/comments').status_code, 404)
+
+    def test_page_queries(self):
+        self.client.get(f'/api/posts/{self.post.pk}/comments')
+        cache.clear()
+
+        with self.assertNumQueries(2):
+            # The comments_count counter and one keyset page
+            self.client.get(f'/api/posts/{self.post.pk}/comments', {'limit': 3})
+
+    def test_expand_author(self):
+        data = self.client.get(f'/api/posts/{self.post.pk}/comments', {'limit': 1, 'expand': 'author'}).json()
+
+        self.assertEqual(data['results'][0]['author']['username'], 'user')
+
+
+class CommentsCountTests(BlogTestCase):
+
+    def test_api_writes_keep_the_counter(self):
+        post = self.active_post()
+
+        comment = self.user_client.post('/api/comments', {'post': post.pk, 'content': 'single'}, format='json').json()
+        self.user_client.post('/api/comments', [{'post': post.pk, 'content': 'bulk'}], format='json')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+
+        self.user_client.delete(f'/api/comments/{comment["id"]}')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.client.get(f'/api/posts/{post.pk}').json()['comments_count'], 1)
+
+
+class PermissionTests(BlogTestCase):
+
+    def assert_authors_not_loaded(self, method, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.staff_client, method)(path)
+
+        author_lookup = re.compile(rf'"account_account"\."id" = {self.user.pk}\b')
+        self.assertFalse([query['sql'] for query in queries if author_lookup.search(query['sql'])])
+
+        return response
+
+    def test_only_author_or_staff_change_comments(self):
+        comment = PostComment.objects.create(post=self.active_post(), author=self.staff, content='staff')
+
+        response = self.user_client.patch(f'/api/comments/{comment.pk}', {'content': 'changed'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        own = self.user_client.post('/api/comments', {'post': self.active_post().pk, 'content': 'own'},
+                                    format='json').json()
+        self.assertEqual(self.user_client.patch(f'/api/comments/{own["id"]}', {'content': 'changed'}, format='json')
+                         .status_code, 200)
+        self.assertEqual(self.staff_client.delete(f'/api/comments/{own["id"]}').status_code, 204)
+
+    def test_reaction_owner_is_checked_by_id(self):
+        reaction = PostReaction.objects.create(post=self.active_post(), author=self.user, reaction='+')
+        response = self.assert_authors_not_loaded('delete', f'/api/reactions/{reaction.pk}')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.user_client.get(f'/api/reactions/{reaction.pk}').status_code, 200)
+
+    def test_comment_list_checks_rows_without_loading_authors(self):
+        PostComment.objects.bulk_create([PostComment(post=self.active_post(), author=self.user, content=str(i))
+                                         for i in range(5)])
+        response = self.assert_authors_not_loaded('get', '/api/comments')
+
+        self.assertEqual(len(response.json()), 5)
+
+    def test_list_permissions_are_a_queryset_condition(self):
+        PostComment.objects.create(post=self.active_post(), author=self.user, content='own')
+        PostComment.objects.create(post=self.active_post(), author=self.staff, content='staff')
+        view = CommentViewSet()
+
+        for method, user, expected in (('get', self.user, 2), ('delete', self.user, 1), ('delete', self.staff, 2)):
+            view.request = Request(getattr(RequestFactory(), method)('/api/comments'))
+            view.request.user = user
+            queryset = permissions.filter_permitted(view.request, view, PostComment.objects.all())
+
+            self.assertEqual(queryset.count(), expected)
+
+
+class TokenBucketBackendTests(SimpleTestCase):
+
+    def tearDown(self):
+        importlib.reload(throttling)
+
+    def test_redis_cache_uses_lua_script(self):
+        redis_cache = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                   'LOCATION': 'redis://localhost:6379'}}
+        with override_settings(CACHES=redis_cache):
+            importlib.reload(throttling)
+
+        self.assertIs(throttling._take_token, throttling._take_token_redis)
+
+    def test_other_caches_use_get_and_set(self):
+        importlib.reload(throttling)
+
+        self.assertIs(throttling._take_token, throttling._take_token_cache)
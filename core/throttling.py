@@ -0,0 +1,105 @@
+"""
+Rate limits per user, or per IP for anonymous requests.
+
+A GCRA token bucket stores one number per key in the cache: the time the bucket is full again.
+With Redis the check and the charge run in one Lua script, so they are atomic across workers.
+"""
+import math
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+GCRA_SCRIPT = '''
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local full_at = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now) + cost * interval
+local wait = full_at - capacity * interval - now
+if wait > 0 then
+    return tostring(wait)
+end
+redis.call('SET', KEYS[1], tostring(full_at), 'PX', math.ceil((full_at - now) * 1000))
+return '0'
+'''
+
+
+def parse_rate(rate):
+    """'30/min' -> (30, 60)"""
+    count, period = rate.split('/')
+    return int(count), RATE_PERIODS[period[0]]
+
+
+def _take_token_redis(key, now, interval, capacity, cost):
+    key = cache.make_and_validate_key(key)
+    client = cache._cache.get_client(key, write=True)
+
+    return float(client.eval(GCRA_SCRIPT, 1, key, now, interval, capacity, cost))
+
+
+def _take_token_cache(key, now, interval, capacity, cost):
+    full_at = max(cache.get(key, now), now) + cost * interval
+    wait = full_at - capacity * interval - now
+    if wait > 0:
+        return wait
+
+    cache.set(key, full_at, timeout=math.ceil(full_at - now))
+    return 0.0
+
+
+# cache is a proxy to the backend of the current thread, so check the backend itself
+_take_token = _take_token_redis if isinstance(caches['default'], RedisCache) else _take_token_cache
+
+
+def take_token(key, capacity, period, cost=1):
+    """Takes cost tokens from bucket key; returns 0 or the seconds to wait"""
+    return _take_token(key, time.time(), period / capacity, capacity, cost)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Rate from DEFAULT_THROTTLE_RATES['<throttle_scope>.<action>']. A request costs
+    view.get_throttle_cost(request) tokens if the view defines it, one otherwise.
+    """
+
+    def __init__(self):
+        self.wait_time = None
+
+    def get_rate(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return None
+
+        return api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}.{getattr(view, "action", None)}')
+
+    def get_ident(self, request, view=None):
+        # throttle_ip_actions always count by IP: a client is already logged in right after signing up
+        by_ip = getattr(view, 'action', None) in getattr(view, 'throttle_ip_actions', ())
+        if request.user.is_authenticated and not by_ip:
+            return f'user:{request.user.pk}'
+
+        return f'ip:{super().get_ident(request)}'
+
+    def allow_request(self, request, view):
+        rate = self.get_rate(view)
+        if rate is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        cost = view.get_throttle_cost(request) if hasattr(view, 'get_throttle_cost') else 1
+        if cost > capacity:
+            raise Throttled(detail=f'Request costs {cost} tokens, the limit is {rate}')
+
+        key = f'throttle:{view.throttle_scope}.{view.action}:{self.get_ident(request, view)}'
+        self.wait_time = take_token(key, capacity, period, cost)
+
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
@@ -0,0 +1,50 @@
+"""
+Model versions for conditional GETs and cache invalidation.
+
+Each model has a (token, changed at) pair in the cache, replaced on every change. Versions are only
+shared between workers with a shared cache (REDIS_URL).
+"""
+import time
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+VERSION_KEY_PREFIX = 'model-version'
+
+
+def _version_key(model):
+    return f'{VERSION_KEY_PREFIX}:{model._meta.label_lower}'
+
+
+def _new_version():
+    return uuid.uuid4().hex, time.time()
+
+
+def is_cache_shared():
+    """Whether the default cache is shared by all processes; version-based caching needs it"""
+    return not isinstance(caches['default'], PROCESS_LOCAL_CACHES)
+
+
+def get_model_versions(models):
+    """{model: (token, changed at)} with one cache lookup"""
+    keys = {_version_key(model): model for model in models}
+    versions = cache.get_many(keys)
+
+    for key in keys.keys() - versions.keys():
+        version = _new_version()
+        cache.add(key, version, timeout=None)
+        versions[key] = cache.get(key, version)
+
+    return {model: versions[key] for key, model in keys.items()}
+
+
+def bump_model_version(*models):
+    def bump():
+        cache.set_many({_version_key(model): _new_version() for model in models}, timeout=None)
+
+    transaction.on_commit(bump)
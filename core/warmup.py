@@ -0,0 +1,45 @@
+"""
+Warms up a process before it serves requests: imports, serializer fields, model metadata and preferences.
+
+With gunicorn preload_app it runs once in the master and workers share the result after fork.
+"""
+import importlib
+import logging
+
+from django.apps import apps
+from django.db import DatabaseError, connections
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def get_serializer_classes():
+    import core.serializers
+
+    for name in core.serializers.__all__:
+        module = importlib.import_module(f'core.serializers.{name}')
+
+        for value in vars(module).values():
+            if (isinstance(value, type) and issubclass(value, BaseSerializer) and not issubclass(value, ListSerializer)
+                    and value.__module__ == module.__name__):
+                yield value
+
+
+def warm_up():
+    import core.api.views  # noqa: F401
+    from core import repository
+
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+    for serializer_class in get_serializer_classes():
+        serializer_class().fields
+
+    try:
+        repository.load_preferences()
+    except DatabaseError as exc:
+        # Workers load them on first use
+        logger.warning('Preferences were not preloaded: %s', exc)
+    finally:
+        # Workers must not inherit the master's connections
+        connections.close_all()
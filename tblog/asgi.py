@@ -9,8 +9,20 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tblog.settings')
 
-application = get_asgi_application()
+
+class AsyncReadRequest(ASGIRequest):
+    # API reads are served by the async views of core.async_urls
+    urlconf = 'core.async_urls'
+
+
+class AsyncReadASGIHandler(ASGIHandler):
+    request_class = AsyncReadRequest
+
+
+django.setup(set_prefix=False)
+application = AsyncReadASGIHandler()
@@ -0,0 +1,36 @@
+"""
+Production gunicorn settings (Procfile): gunicorn tblog.wsgi -c python:tblog.gunicorn_config
+"""
+import math
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+# Requests mostly wait on the database and cache, so concurrency comes from threads rather than processes
+workers = int(os.environ.get('WEB_CONCURRENCY', cpu_count + 1))
+# Threads top the workers up to about 2 * CPU whatever WEB_CONCURRENCY is. Each thread keeps its own
+# database connection, so an instance opens workers * threads of them; GUNICORN_THREADS lowers that budget
+threads = int(os.environ.get('GUNICORN_THREADS', max(2, math.ceil(2 * cpu_count / workers))))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Load the app once in the master and share it with workers through copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from core.versions import is_cache_shared
+        from core.warmup import warm_up
+        warm_up()
+        server.log.info('Application warmed up before forking workers')
+
+        if server.cfg.workers > 1 and not is_cache_shared():
+            server.log.warning('The default cache is local to each worker: rate limits are counted per worker and '
+                               'ETags, response and session caching are off. Set REDIS_URL')
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        from core.warmup import warm_up
+        warm_up()
@@ -44,8 +44,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -84,6 +86,40 @@ DATABASES = dict()
 db_from_env = dj_database_url.config()
 DATABASES['default'] = db_from_env
 
+# Read replicas: comma-separated DATABASE_REPLICA_URLS, aliased replica_1, replica_2, ...
+REPLICA_DATABASES = []
+
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip())
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
+# Seconds during which a client that wrote something, and any request whose models changed, read from the primary
+REPLICA_STICKY_SECONDS = 5
+
+# Seconds between availability checks of each replica in a process
+REPLICA_HEALTH_CHECK_INTERVAL = 10
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Model versions (ETag) are stored here, so production must use a cache shared by all workers.
+# With a process-local cache (LocMem, Dummy) ETags and other version-based caching are turned off
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -128,6 +164,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'account.Account'
 
+# ModelBackend stays for sessions created before CachedModelBackend
+AUTHENTICATION_BACKENDS = [
+    'account.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# With a per-process cache a logout in one worker would not reach the others, so sessions stay in the database
+if os.environ.get('REDIS_URL'):
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 MEDIA_URL = '/MEDIA/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'MEDIA')
 
@@ -135,9 +181,39 @@ APPEND_SLASH = False
 
 
 REST_FRAMEWORK = {
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_THROTTLE_CLASSES': ['core.throttling.TokenBucketThrottle'],
+    # Proxies in front of the app: the client IP is taken that many entries from the end of X-Forwarded-For,
+    # so addresses added by the client itself are ignored. 0 uses REMOTE_ADDR only
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 1)),
+    # '<throttle_scope>.<action>': '<requests>/<s|min|hour|day>', counted per user or IP.
+    # Buckets live in the default cache: without REDIS_URL each worker counts its own, so the real limit
+    # is the rate times the number of workers
+    'DEFAULT_THROTTLE_RATES': {
+        'accounts.create': '5/hour',
+        'accounts.user_login': '10/min',
+        'comments.create': '20/min',
+        'comments.partial_update': '30/min',
+        'comments.destroy': '30/min',
+        'reactions.create': '60/min',
+        'reactions.partial_update': '60/min',
+        'reactions.destroy': '60/min',
+    },
 }
 
+# Seconds for which Preference and Limit values are cached in each process. With a shared cache a change is
+# picked up at once through the model versions, the TTL only covers QuerySet.update and direct SQL
+PREFERENCES_CACHE_TTL = 300
+
+# Seconds for which API response data is kept in the shared cache
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Seconds for which the account of a session is kept in the shared cache
+ACCOUNT_CACHE_TIMEOUT = 300
+
+# Seconds between full rebuilds of the in-memory account prefix index of each process
+ACCOUNT_INDEX_REBUILD_INTERVAL = 600
+
 VERSATILEIMAGEFIELD_RENDITION_KEY_SETS = {
     'product_headshot': [
         ('full_size', 'url'),